@@ -1,15 +1,94 @@
-from flask import Flask, render_template, request, jsonify, session, Response
-from course_data import CourseDataProcessor
+from flask import Flask, render_template, request, jsonify, session, Response, g
+from course_data import CourseDataProcessor, dump_json, json_etag
+from schedule_store import is_schedule_id, new_schedule_id, open_schedule_store
+from timeslots import parse_time_window
+from timetable_watcher import TimetableWatcher, find_latest_timetable
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 import re
 import pytz
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this-in-production'
 
+DATA_DIR = 'data'
+DEFAULT_TIMETABLE = 'data/2025-26_class_timetable_20250806.xlsx'
+# 检查课表文件变化的间隔（秒），0 表示不监视
+WATCH_INTERVAL = int(os.environ.get('CLASS_PLANNER_WATCH_INTERVAL', 30))
+# 指定课表文件时只使用并监视该文件，否则使用 data/ 下文件名日期最新的课表
+TIMETABLE_PATH = os.environ.get('CLASS_PLANNER_TIMETABLE')
+
 # 初始化课程数据处理器
-data_processor = CourseDataProcessor('data/2025-26_class_timetable_20250806.xlsx')
+data_processor = CourseDataProcessor(TIMETABLE_PATH or find_latest_timetable(DATA_DIR) or DEFAULT_TIMETABLE)
+_timetable_watcher = None
+
+# 日程表存储：SQLite 数据库文件路径，'memory' 表示只保存在进程内存中（测试用）。
+# session 中只保存日程表ID，日程表内容保存在这里
+SCHEDULE_STORE = os.environ.get('CLASS_PLANNER_SCHEDULE_STORE', os.path.join(DATA_DIR, 'schedules.sqlite3'))
+schedule_store = open_schedule_store(SCHEDULE_STORE)
+
+def get_processor():
+    """当前请求使用的数据处理器；同一请求内即使课表被替换也保持不变"""
+    if 'processor' not in g:
+        g.processor = data_processor
+    return g.processor
+
+def reload_timetable(xlsx_file_path):
+    """在后台构建新的数据处理器，完成后整体替换"""
+    global data_processor
+    print(f"检测到课表变化，重新加载: {xlsx_file_path}")
+    new_processor = CourseDataProcessor(xlsx_file_path)
+    data_processor = new_processor
+    print(f"课表已切换: {xlsx_file_path}")
+
+def start_timetable_watcher():
+    """启动课表监视线程（每个进程一次；gunicorn 下在 worker fork 之后调用）"""
+    global _timetable_watcher
+    if WATCH_INTERVAL <= 0 or _timetable_watcher is not None:
+        return
+    _timetable_watcher = TimetableWatcher(
+        DATA_DIR, data_processor.xlsx_file_path, reload_timetable, WATCH_INTERVAL,
+        timetable_path=TIMETABLE_PATH
+    )
+    _timetable_watcher.start()
+
+# 批量获取课程详情时单次请求的课程数上限
+MAX_BATCH_COURSES = 50
+# 按空闲时间查找课程时单次请求的时间窗口数上限
+MAX_TIME_WINDOWS = 14
+
+# 自动排课：单次请求的课程数上限、返回组合数的默认值和上限、搜索时间上限（秒）
+MAX_GENERATE_COURSES = 12
+DEFAULT_GENERATE_LIMIT = 20
+MAX_GENERATE_LIMIT = 100
+GENERATE_TIME_BUDGET = 1.0
+
+# 只读接口的数据只在加载新课表时变化，浏览器可短暂缓存，过期后用ETag重新验证
+API_CACHE_CONTROL = 'public, max-age=60'
+# 依赖 session 中日程表的响应只允许浏览器缓存，每次都用ETag重新验证
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+def json_response(body, etag, cache_control=API_CACHE_CONTROL):
+    """直接返回已序列化的JSON bytes，If-None-Match 命中时返回304"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+def request_etag(*extra):
+    """由数据版本和请求参数（以及响应依赖的其他数据 extra）生成ETag：
+    数据不变时，同一请求的响应也不变"""
+    args = sorted(request.args.items(multi=True))
+    return json_etag(dump_json([get_processor().data_version, request.path, args, *extra]))
+
+def not_modified(etag, cache_control=API_CACHE_CONTROL):
+    """在生成响应内容之前检查 If-None-Match，命中时返回304"""
+    if etag not in request.if_none_match:
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
 
 @app.route('/')
 def index():
@@ -26,6 +105,40 @@ def schedule():
     """日程表页面"""
     return render_template('schedule.html')
 
+def load_schedule(semester):
+    """当前用户某学期的日程表 [{course_code, subclass, course_title, semester}]
+
+    旧版本保存在 session 中的日程表在首次访问时迁移到日程表存储。
+    """
+    legacy_schedule = session.pop(f'schedule_{semester}', None)
+    if legacy_schedule is not None:
+        processor = get_processor()
+        entries = [
+            processor.schedule_entry(item['course_code'], item['subclass'], semester)
+            for item in legacy_schedule
+        ]
+        # 旧 cookie 中已不存在的课程直接丢弃
+        schedule = processor.resolve_schedule([entry for entry in entries if entry], semester)
+        save_schedule(semester, schedule)
+        return schedule
+    
+    schedule_id = session.get('schedule_id')
+    if schedule_id is None:
+        return []
+    return get_processor().resolve_schedule(schedule_store.load(schedule_id, semester), semester)
+
+def save_schedule(semester, schedule):
+    """保存当前用户某学期的日程表，首次保存非空日程表时分配日程表ID"""
+    if 'schedule_id' not in session:
+        if not schedule:
+            return
+        session['schedule_id'] = new_schedule_id()
+    processor = get_processor()
+    schedule_store.save(session['schedule_id'], semester, [
+        processor.schedule_entry(item['course_code'], item['subclass'], semester)
+        for item in schedule
+    ])
+
 @app.route('/api/courses')
 def api_courses():
     """API: 获取课程列表（支持分页）"""
@@ -34,61 +147,162 @@ def api_courses():
     semester = request.args.get('semester', 'Sem1')
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 20))
+    # 只显示能加入当前学期日程表（不产生时间冲突）的课程
+    fits_schedule = request.args.get('fits_schedule') in ('1', 'true')
     
-    # 获取所有匹配的课程
-    all_courses = data_processor.search_courses(query, department, semester)
+    if fits_schedule:
+        schedule = load_schedule(semester)
+        cache_control = PRIVATE_CACHE_CONTROL
+        etag = request_etag(schedule)
+    else:
+        schedule = None
+        cache_control = API_CACHE_CONTROL
+        etag = request_etag()
+    cached = not_modified(etag, cache_control)
+    if cached:
+        return cached
+    
+    # 只取出当前页的课程，总数由搜索索引直接得到
+    processor = get_processor()
+    courses, total_courses = processor.search_courses_page(
+        query, department, semester, page, per_page, fits_schedule=schedule
+    )
     
     # 计算分页
-    total_courses = len(all_courses)
     total_pages = (total_courses + per_page - 1) // per_page
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    courses = all_courses[start_index:end_index]
     
-    return jsonify({
-        'courses': courses,
-        'pagination': {
+    # 拼接每门课程预先序列化好的JSON，键顺序与 jsonify 一致
+    body = b''.join([
+        b'{"courses":[',
+        b','.join(processor.get_course_json(course.code, semester)[0] for course in courses),
+        b'],"pagination":',
+        dump_json({
             'page': page,
             'per_page': per_page,
             'total': total_courses,
             'total_pages': total_pages,
             'has_prev': page > 1,
             'has_next': page < total_pages
-        }
-    })
+        }),
+        b'}'
+    ])
+    return json_response(body, etag, cache_control)
 
 @app.route('/api/departments')
 def api_departments():
-    """API: 获取所有院系列表"""
+    """API: 获取所有院系列表；counts=1 时返回 [{department, course_count}]"""
     semester = request.args.get('semester', 'Sem1')
-    departments = data_processor.get_all_departments(semester)
-    return jsonify(departments)
+    with_counts = request.args.get('counts', '') in ('1', 'true')
+    etag = request_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    if with_counts:
+        departments = [
+            {'department': department, 'course_count': count}
+            for department, count in get_processor().get_department_counts(semester)
+        ]
+    else:
+        departments = get_processor().get_all_departments(semester)
+    return json_response(dump_json(departments), etag)
 
 @app.route('/api/semesters')
 def api_semesters():
     """API: 获取所有可用学期"""
-    semesters = data_processor.get_available_semesters()
-    return jsonify(semesters)
+    etag = request_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    semesters = get_processor().get_available_semesters()
+    return json_response(dump_json(semesters), etag)
 
 @app.route('/api/course/<course_code>')
 def api_course_detail(course_code):
     """API: 获取特定课程详情"""
     semester = request.args.get('semester', 'Sem1')
-    course = data_processor.get_course_by_code_and_semester(course_code, semester)
-    if course:
-        return jsonify(course)
+    course_json = get_processor().get_course_json(course_code, semester)
+    if course_json:
+        return json_response(*course_json)
     else:
         return jsonify({'error': 'Course not found'}), 404
 
+@app.route('/api/courses/batch')
+def api_course_batch():
+    """API: 一次获取多门课程详情，返回 {course_code: course}
+
+    schedule=1 时返回当前学期日程表中的全部课程（由服务器端读取日程表，不受课程数上限限制）。
+    """
+    semester = request.args.get('semester', 'Sem1')
+    if request.args.get('schedule') in ('1', 'true'):
+        schedule = load_schedule(semester)
+        codes = [item['course_code'] for item in schedule]
+        cache_control = PRIVATE_CACHE_CONTROL
+        etag = request_etag(schedule)
+    else:
+        codes = [code for code in request.args.get('codes', '').split(',') if code]
+        if len(codes) > MAX_BATCH_COURSES:
+            return jsonify({'error': f'At most {MAX_BATCH_COURSES} courses per request'}), 400
+        cache_control = API_CACHE_CONTROL
+        etag = request_etag()
+    
+    cached = not_modified(etag, cache_control)
+    if cached:
+        return cached
+    
+    # 拼接每门课程预先序列化好的JSON，不存在的课程直接跳过
+    processor = get_processor()
+    entries = []
+    for code in sorted(set(codes)):
+        course_json = processor.get_course_json(code, semester)
+        if course_json:
+            entries.append(dump_json(code) + b':' + course_json[0])
+    body = b'{' + b','.join(entries) + b'}'
+    return json_response(body, etag, cache_control)
+
+@app.route('/api/courses/free-time')
+def api_courses_free_time():
+    """API: 查找有subclass的全部上课时间都在给定空闲时间内的课程
+
+    window 可重复，如 window=TUE 14:00-18:00&window=THU 08:00-12:00，只写星期表示全天。
+    """
+    semester = request.args.get('semester', 'Sem1')
+    window_texts = request.args.getlist('window')
+    if not window_texts:
+        return jsonify({'error': 'Missing window'}), 400
+    if len(window_texts) > MAX_TIME_WINDOWS:
+        return jsonify({'error': f'At most {MAX_TIME_WINDOWS} windows per request'}), 400
+    windows = [parse_time_window(text) for text in window_texts]
+    invalid = [text for text, window in zip(window_texts, windows) if window is None]
+    if invalid:
+        return jsonify({'error': 'Invalid window', 'invalid_windows': invalid}), 400
+    
+    etag = request_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    matches = get_processor().find_courses_within(windows, semester)
+    body = dump_json({
+        'courses': [
+            {
+                'code': course.code,
+                'title': course.title,
+                'department': course.department,
+                'subclasses': labels
+            }
+            for course, labels in matches
+        ],
+        'total': len(matches)
+    })
+    return json_response(body, etag)
+
 @app.route('/api/schedule', methods=['GET', 'POST'])
 def api_schedule():
     """API: 管理用户日程表"""
     if request.method == 'GET':
         # 获取用户日程表
         semester = request.args.get('semester', 'Sem1')
-        schedule_key = f'schedule_{semester}'
-        schedule = session.get(schedule_key, [])
-        return jsonify(schedule)
+        return jsonify(load_schedule(semester))
     
     elif request.method == 'POST':
         # 添加课程到日程表
@@ -101,13 +315,12 @@ def api_schedule():
             return jsonify({'error': 'Missing course_code or subclass'}), 400
         
         # 验证课程存在
-        course = data_processor.get_course_by_code_and_semester(course_code, semester)
-        if not course or subclass not in course['subclasses']:
+        course = get_processor().get_course_by_code_and_semester(course_code, semester)
+        if not course or subclass not in course.subclasses:
             return jsonify({'error': 'Invalid course or subclass'}), 400
         
         # 获取当前学期的日程表
-        schedule_key = f'schedule_{semester}'
-        schedule = session.get(schedule_key, [])
+        schedule = load_schedule(semester)
         
         # 检查是否已经添加了相同课程的其他subclass
         for item in schedule:
@@ -116,7 +329,7 @@ def api_schedule():
         
         # 检查时间冲突
         new_schedule = schedule + [{'course_code': course_code, 'subclass': subclass}]
-        conflicts = data_processor.get_time_conflict(new_schedule, semester)
+        conflicts = get_processor().get_time_conflict(new_schedule, semester)
         
         if conflicts:
             return jsonify({
@@ -128,10 +341,10 @@ def api_schedule():
         schedule.append({
             'course_code': course_code,
             'subclass': subclass,
-            'course_title': course['title'],
+            'course_title': course.title,
             'semester': semester
         })
-        session[schedule_key] = schedule
+        save_schedule(semester, schedule)
         
         return jsonify({'success': True, 'schedule': schedule})
 
@@ -142,48 +355,88 @@ def api_remove_from_schedule():
     course_code = data.get('course_code')
     semester = data.get('semester', 'Sem1')
     
-    schedule_key = f'schedule_{semester}'
-    schedule = session.get(schedule_key, [])
-    schedule = [item for item in schedule if item['course_code'] != course_code]
-    session[schedule_key] = schedule
+    schedule = [item for item in load_schedule(semester) if item['course_code'] != course_code]
+    save_schedule(semester, schedule)
     
     return jsonify({'success': True, 'schedule': schedule})
 
+@app.route('/api/schedule/id', methods=['GET', 'POST'])
+def api_schedule_id():
+    """API: 查看当前日程表ID；POST {schedule_id} 切换到已有的日程表（在其他设备上共用）"""
+    if request.method == 'POST':
+        schedule_id = (request.json or {}).get('schedule_id')
+        if not is_schedule_id(schedule_id):
+            return jsonify({'error': 'Invalid schedule_id'}), 400
+        session['schedule_id'] = schedule_id
+    return jsonify({'schedule_id': session.get('schedule_id')})
+
 @app.route('/api/schedule/conflicts')
 def api_schedule_conflicts():
     """API: 检查日程表时间冲突"""
     semester = request.args.get('semester', 'Sem1')
-    schedule_key = f'schedule_{semester}'
-    schedule = session.get(schedule_key, [])
-    conflicts = data_processor.get_time_conflict(schedule, semester)
+    schedule = load_schedule(semester)
+    conflicts = get_processor().get_time_conflict(schedule, semester)
     return jsonify({'conflicts': conflicts})
 
+@app.route('/api/schedule/generate', methods=['POST'])
+def api_generate_schedule():
+    """API: 为选定的课程自动生成无时间冲突的subclass组合"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    course_codes = data.get('course_codes') or []
+    semester = data.get('semester', 'Sem1')
+    limit = data.get('limit', DEFAULT_GENERATE_LIMIT)
+    
+    if not isinstance(course_codes, list) or not all(isinstance(code, str) for code in course_codes):
+        return jsonify({'error': 'course_codes must be a list of strings'}), 400
+    # bool 是 int 的子类，不接受 true/false
+    if not isinstance(limit, int) or isinstance(limit, bool):
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not isinstance(semester, str):
+        return jsonify({'error': 'semester must be a string'}), 400
+    course_codes = list(dict.fromkeys(course_codes))
+    limit = min(max(limit, 1), MAX_GENERATE_LIMIT)
+    
+    if not course_codes:
+        return jsonify({'error': 'Missing course_codes'}), 400
+    if len(course_codes) > MAX_GENERATE_COURSES:
+        return jsonify({'error': f'At most {MAX_GENERATE_COURSES} courses per request'}), 400
+    
+    processor = get_processor()
+    unknown = [code for code in course_codes
+               if not processor.get_course_by_code_and_semester(code, semester)]
+    if unknown:
+        return jsonify({'error': 'Invalid course', 'unknown_courses': unknown}), 400
+    
+    result = processor.generate_schedules(course_codes, semester, limit, GENERATE_TIME_BUDGET)
+    return jsonify(result)
+
 @app.route('/api/schedule/export-ics')
 def api_export_ics():
     """API: 导出日程表为ICS文件"""
     semester = request.args.get('semester', 'Sem1')
-    schedule_key = f'schedule_{semester}'
-    schedule = session.get(schedule_key, [])
+    schedule = load_schedule(semester)
     
     if not schedule:
         return jsonify({'error': 'No courses in schedule'}), 400
     
-    # Generate ICS content
-    ics_content = generate_ics_calendar(schedule, semester)
+    # 边生成边发送：生成器不依赖请求上下文，处理器在此时确定
+    ics_content = generate_ics_calendar(get_processor(), schedule, semester)
     
     # Return as downloadable file
     response = Response(ics_content, mimetype='text/calendar')
     response.headers['Content-Disposition'] = f'attachment; filename=schedule_{semester}.ics'
     return response
 
-def generate_ics_calendar(schedule, semester):
-    """生成ICS日历内容"""
+def generate_ics_calendar(processor, schedule, semester):
+    """逐段生成ICS日历内容：先输出日历头部，之后每生成一个VEVENT就输出一段"""
     
     # Define Hong Kong timezone
     hk_tz = pytz.timezone('Asia/Hong_Kong')
     
     # ICS header with timezone definition
-    ics_lines = [
+    yield '\r\n'.join([
         'BEGIN:VCALENDAR',
         'VERSION:2.0',
         'PRODID:-//Course Planner//Course Schedule//EN',
@@ -199,7 +452,7 @@ def generate_ics_calendar(schedule, semester):
         'TZNAME:HKT',
         'END:STANDARD',
         'END:VTIMEZONE'
-    ]
+    ])
     
     # Get semester dates (approximation - you may want to adjust these)
     semester_dates = get_semester_dates(semester)
@@ -210,24 +463,23 @@ def generate_ics_calendar(schedule, semester):
         subclass_label = item['subclass']
         
         # Get course details
-        course = data_processor.get_course_by_code_and_semester(course_code, semester)
-        if not course or subclass_label not in course['subclasses']:
+        course = processor.get_course_by_code_and_semester(course_code, semester)
+        if not course or subclass_label not in course.subclasses:
             continue
             
-        subclass = course['subclasses'][subclass_label]
+        subclass = course.subclasses[subclass_label]
         
         # Create events for each time slot in the subclass
-        for time_slot in subclass['time_slots']:
-            for day in time_slot['days']:
-                events = create_recurring_events(
+        for time_slot in subclass.time_slots:
+            for day in time_slot.days:
+                event_lines = create_recurring_events(
                     course, time_slot, day, semester_dates, course_code, subclass_label, hk_tz
                 )
-                ics_lines.extend(events)
+                if event_lines:
+                    yield '\r\n' + '\r\n'.join(event_lines)
     
     # ICS footer
-    ics_lines.append('END:VCALENDAR')
-    
-    return '\r\n'.join(ics_lines)
+    yield '\r\nEND:VCALENDAR'
 
 def get_semester_dates(semester):
     """获取学期的开始和结束日期（近似值）"""
@@ -271,24 +523,13 @@ def create_recurring_events(course, time_slot, day, semester_dates, course_code,
     while current.weekday() != target_weekday:
         current += timedelta(days=1)
     
-    # Parse start and end times
-    try:
-        start_time_str = time_slot['start_time']
-        end_time_str = time_slot['end_time']
-        
-        # Handle time format (HH:MM:SS or HH:MM)
-        if len(start_time_str) == 8:  # HH:MM:SS
-            start_time = datetime.strptime(start_time_str, '%H:%M:%S').time()
-        else:  # HH:MM
-            start_time = datetime.strptime(start_time_str, '%H:%M').time()
-            
-        if len(end_time_str) == 8:  # HH:MM:SS
-            end_time = datetime.strptime(end_time_str, '%H:%M:%S').time()
-        else:  # HH:MM
-            end_time = datetime.strptime(end_time_str, '%H:%M').time()
-            
-    except ValueError:
+    # Use the pre-parsed minutes since midnight
+    start_minutes = time_slot.start_minutes
+    end_minutes = time_slot.end_minutes
+    if start_minutes is None or end_minutes is None:
         return []
+    start_time = time(*divmod(start_minutes, 60))
+    end_time = time(*divmod(end_minutes, 60))
     
     # Create the event with Hong Kong timezone
     event_start = hk_tz.localize(datetime.combine(current.date(), start_time))
@@ -316,9 +557,9 @@ def create_recurring_events(course, time_slot, day, semester_dates, course_code,
         f'DTSTART;TZID=Asia/Hong_Kong:{format_datetime_tz(event_start)}',
         f'DTEND;TZID=Asia/Hong_Kong:{format_datetime_tz(event_end)}',
         f'RRULE:{rrule}',
-        f'SUMMARY:{course_code} - {course["title"]}',
-        f'DESCRIPTION:Course: {course_code}\\nClass: {subclass_label}\\nInstructor: {time_slot["instructor"]}',
-        f'LOCATION:{time_slot["venue"]}',
+        f'SUMMARY:{course_code} - {course.title}',
+        f'DESCRIPTION:Course: {course_code}\\nClass: {subclass_label}\\nInstructor: {time_slot.instructor}',
+        f'LOCATION:{time_slot.venue}',
         f'CREATED:{now_hk.strftime("%Y%m%dT%H%M%S")}',
         f'LAST-MODIFIED:{now_hk.strftime("%Y%m%dT%H%M%S")}',
         'END:VEVENT'
@@ -327,4 +568,5 @@ def create_recurring_events(course, time_slot, day, semester_dates, course_code,
     return event_lines
 
 if __name__ == '__main__':
+    start_timetable_watcher()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,755 @@
+#!/usr/bin/env python3
+"""
+性能基准脚本：对比旧实现与当前实现
+运行命令：uv run python benchmark.py [名称 ...]
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+
+import pandas as pd
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+from course_cache import load_courses, load_table, save_courses, save_table
+from course_data import CACHE_VERSION, SOURCE_COLUMNS, CourseDataProcessor, DAYS
+from process_backup_data import deduplicate_entries
+from schedule_store import MemoryScheduleStore, SQLiteScheduleStore, new_schedule_id
+from timeslots import parse_time_window
+from xlsx_reader import read_xlsx
+
+TIMETABLE_FILE = 'data/2025-26_class_timetable_20250806.xlsx'
+BACKUP_FILE = 'data/2025-26_class_timetable_20250806_backup.xlsx'
+
+
+def timeit(func, repeat=5):
+    """运行 repeat 次，返回最快一次的耗时（秒）和最后一次的结果"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        # 屏蔽被测代码中的进度输出
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def report(name, legacy_seconds, current_seconds):
+    speedup = legacy_seconds / current_seconds if current_seconds else float('inf')
+    print(f"  {name:<48} 旧: {legacy_seconds * 1000:9.2f} ms  "
+          f"新: {current_seconds * 1000:9.2f} ms  加速: {speedup:6.1f}x")
+
+
+def read_timetable(path):
+    df = pd.read_excel(path)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def processor_from_dataframe(df):
+    """不经过缓存，直接用给定DataFrame构造处理器"""
+    processor = CourseDataProcessor.__new__(CourseDataProcessor)
+    processor.xlsx_file_path = None
+    processor.df = df.copy()
+    processor.processed_courses = None
+    return processor
+
+
+def as_dicts(processed_courses):
+    """将课程模型转换为接口返回的字典结构"""
+    return {
+        semester: {code: course.to_dict() for code, course in courses.items()}
+        for semester, courses in processed_courses.items()
+    }
+
+
+# ---------------------------------------------------------------------------
+# 旧实现（仅用于对比）
+# ---------------------------------------------------------------------------
+
+def legacy_process_courses(df):
+    """原始的逐行 iterrows 实现"""
+    courses_by_semester = {'Sem1': {}, 'Sem2': {}, 'Summer': {}, 'Other': {}}
+    df = df.copy()
+    processor = CourseDataProcessor.__new__(CourseDataProcessor)
+    df['SEMESTER'] = df['CLASS SECTION'].apply(processor.get_semester_from_section)
+    valid_df = df.dropna(subset=['COURSE CODE']).copy()
+
+    def as_str(value):
+        return str(value) if pd.notna(value) else ''
+
+    for course_code, course_group in valid_df.groupby('COURSE CODE'):
+        course_info = course_group.iloc[0]
+        for semester, semester_group in course_group.groupby('SEMESTER'):
+            entries = []
+            for _, row in semester_group.iterrows():
+                days = [day for day in DAYS if pd.notna(row[day])]
+                entries.append({
+                    'section': as_str(row['CLASS SECTION']),
+                    'days': days,
+                    'start_time': as_str(row['START TIME']),
+                    'end_time': as_str(row['END TIME']),
+                    'venue': as_str(row['VENUE']),
+                    'instructor': as_str(row['INSTRUCTOR']),
+                    'class_number': as_str(row['CLASS NUMBER'])
+                })
+            if not entries:
+                continue
+            subclasses = {}
+            entries_by_class_number = defaultdict(list)
+            for entry in entries:
+                entries_by_class_number[entry['class_number']].append(entry)
+            for class_number, class_entries in entries_by_class_number.items():
+                first_entry = class_entries[0]
+                time_slots = []
+                seen = set()
+                for entry in class_entries:
+                    day_tuple = tuple(sorted(entry['days']))
+                    if day_tuple not in seen:
+                        seen.add(day_tuple)
+                        time_slots.append({
+                            'days': entry['days'],
+                            'start_time': entry['start_time'],
+                            'end_time': entry['end_time'],
+                            'venue': entry['venue'],
+                            'instructor': entry['instructor']
+                        })
+                subclasses[first_entry['section']] = {
+                    'label': first_entry['section'],
+                    'section': first_entry['section'],
+                    'class_number': class_number,
+                    'instructor': first_entry['instructor'],
+                    'time_slots': time_slots
+                }
+            courses_by_semester[semester][course_code] = {
+                'code': course_code,
+                'title': as_str(course_info['COURSE TITLE']),
+                'department': as_str(course_info['OFFER DEPT']),
+                'term': as_str(course_info['TERM']),
+                'career': as_str(course_info['ACAD_CAREER']),
+                'semester': semester,
+                'subclasses': subclasses
+            }
+    return courses_by_semester
+
+
+def legacy_search_courses(semester_courses, query='', department=''):
+    """原始的全量扫描搜索"""
+    results = []
+    query = query.lower() if query else ''
+    department = department.upper() if department else ''
+    for course_code, course_info in semester_courses.items():
+        match = True
+        if query:
+            match = query in course_code.lower() or query in course_info.title.lower()
+        if department and match:
+            match = department in course_info.department.upper()
+        if match:
+            results.append(course_info)
+    return results
+
+
+def legacy_get_time_conflict(processor, schedule, semester):
+    """原始的逐对比较冲突检测（每对调用四次 strptime）"""
+    def time_overlap(start1, end1, start2, end2):
+        try:
+            start1 = datetime.strptime(start1, '%H:%M:%S').time()
+            end1 = datetime.strptime(end1, '%H:%M:%S').time()
+            start2 = datetime.strptime(start2, '%H:%M:%S').time()
+            end2 = datetime.strptime(end2, '%H:%M:%S').time()
+            return not (end1 <= start2 or end2 <= start1)
+        except ValueError:
+            return False
+
+    time_slots = []
+    for item in schedule:
+        course = processor.get_course_by_code_and_semester(item['course_code'], semester)
+        if course and item['subclass'] in course.subclasses:
+            for time_slot in course.subclasses[item['subclass']].time_slots:
+                for day in time_slot.days:
+                    time_slots.append({
+                        'day': day,
+                        'start': time_slot.start_time,
+                        'end': time_slot.end_time,
+                        'course': f"{item['course_code']} ({item['subclass']})"
+                    })
+    conflicts = []
+    for i in range(len(time_slots)):
+        for j in range(i + 1, len(time_slots)):
+            slot1, slot2 = time_slots[i], time_slots[j]
+            if (slot1['day'] == slot2['day'] and
+                    time_overlap(slot1['start'], slot1['end'], slot2['start'], slot2['end'])):
+                conflicts.append((slot1['course'], slot2['course']))
+    return conflicts
+
+
+def legacy_deduplicate_entries(df):
+    """旧版 process_backup_data 去重：逐组 iterrows，按星期几组合保留第一个entry"""
+    processed_entries = []
+    for course_code, course_group in df.groupby('COURSE CODE'):
+        if pd.isna(course_code):
+            continue
+        for class_number, class_group in course_group.groupby('CLASS NUMBER'):
+            if pd.isna(class_number):
+                continue
+            processed_day_combinations = set()
+            for _, row in class_group.iterrows():
+                days = []
+                for day in ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']:
+                    if pd.notna(row[day]):
+                        days.append(day)
+                day_tuple = tuple(sorted(days))
+                if day_tuple not in processed_day_combinations:
+                    processed_day_combinations.add(day_tuple)
+                    processed_entries.append(row.to_dict())
+    return pd.DataFrame(processed_entries)
+
+
+def legacy_generate_schedules(processor, course_codes, semester, limit, time_budget):
+    """逐个枚举全部subclass组合，用 get_time_conflict 检查（模拟逐个尝试添加）"""
+    deadline = time.perf_counter() + time_budget
+    courses = [processor.get_course_by_code_and_semester(code, semester) for code in course_codes]
+    schedules = []
+    for labels in itertools.product(*[list(course.subclasses) for course in courses]):
+        schedule = [{'course_code': code, 'subclass': label} for code, label in zip(course_codes, labels)]
+        if not processor.get_time_conflict(schedule, semester):
+            schedules.append(schedule)
+            if len(schedules) >= limit:
+                break
+        if time.perf_counter() > deadline:
+            return schedules, True
+    return schedules, False
+
+
+# ---------------------------------------------------------------------------
+# 基准
+# ---------------------------------------------------------------------------
+
+def bench_ingest():
+    """process_courses：逐行 iterrows vs 整列处理"""
+    print("== 课程数据处理 (process_courses) ==")
+    for path in (TIMETABLE_FILE, BACKUP_FILE):
+        df = read_timetable(path)
+        legacy_seconds, expected = timeit(lambda: legacy_process_courses(df), repeat=1)
+        current_seconds, actual = timeit(
+            lambda: processor_from_dataframe(df).process_courses(), repeat=3
+        )
+        assert as_dicts(actual) == expected, f"{path}: 处理结果与旧实现不一致"
+        report(f"{path.split('/')[-1]} ({len(df)} 行)", legacy_seconds, current_seconds)
+
+
+def realistic_course_sets(processor, semester, size, count, rng):
+    """从有多个subclass的真实课程中随机组成 count 个至少有一个无冲突组合的课程集合"""
+    semester_courses = processor.get_courses_by_semester(semester)
+    candidates = [code for code, course in semester_courses.items() if len(course.subclasses) >= 2]
+    course_sets = []
+    while len(course_sets) < count:
+        codes = rng.sample(candidates, size)
+        if processor.generate_schedules(codes, semester, limit=1)['schedules']:
+            course_sets.append(codes)
+    return course_sets
+
+
+def bench_generate():
+    """自动排课：逐个枚举组合 vs 回溯 + 前向检查"""
+    print("== 自动排课 (generate_schedules, 前 20 个组合, 旧实现最多 10 秒) ==")
+    processor = load_processor()
+    rng = random.Random(2025)
+    semester_courses = processor.get_courses_by_semester('Sem1')
+    # subclass 最多的课程：组合数最大，且大多互相冲突，需要搜索整个空间
+    most_sections = sorted(semester_courses, key=lambda code: -len(semester_courses[code].subclasses))
+    course_sets = [
+        codes for size in (4, 6, 8, 10)
+        for codes in realistic_course_sets(processor, 'Sem1', size, 3, rng)
+    ] + [most_sections[:size] for size in (6, 8)]
+
+    for codes in course_sets:
+        combinations = 1
+        for code in codes:
+            combinations *= len(semester_courses[code].subclasses)
+        legacy_seconds, (expected, legacy_timed_out) = timeit(
+            lambda: legacy_generate_schedules(processor, codes, 'Sem1', 20, 10.0), repeat=1
+        )
+        current_seconds, actual = timeit(
+            lambda: processor.generate_schedules(codes, 'Sem1', limit=20), repeat=5
+        )
+        for schedule in actual['schedules']:
+            assert not processor.get_time_conflict(schedule, 'Sem1'), f"{codes}: 生成的组合有冲突"
+        if not legacy_timed_out:
+            assert len(actual['schedules']) == len(expected), f"{codes}: 组合数量不一致"
+        label = (f"{len(codes)} 门课 {combinations} 种组合 -> {len(actual['schedules'])} 个"
+                 f"{' (旧实现超时)' if legacy_timed_out else ''}")
+        report(label, legacy_seconds, current_seconds)
+
+
+def bench_xlsx():
+    """读取课表：pd.read_excel vs 流式解析所需列 / 转换后的课表数据文件"""
+    print("== 读取课表 (read_xlsx / load_table) ==")
+    columns = SOURCE_COLUMNS + DAYS
+    for path in (TIMETABLE_FILE, BACKUP_FILE):
+        name = path.split('/')[-1]
+        legacy_seconds, expected = timeit(lambda: read_timetable(path), repeat=3)
+        current_seconds, actual = timeit(lambda: read_xlsx(path, columns=columns), repeat=3)
+        pd.testing.assert_frame_equal(actual, expected[columns])
+        report(f"{name} ({len(actual)} 行)", legacy_seconds, current_seconds)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            table_path = os.path.join(tmp, 'timetable.table')
+            save_table(table_path, actual)
+            table_seconds, loaded = timeit(lambda: load_table(table_path), repeat=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected_courses = processor_from_dataframe(actual).process_courses()
+            loaded_courses = processor_from_dataframe(loaded).process_courses()
+        assert loaded_courses == expected_courses, f"{name}: 课表数据文件处理结果不一致"
+        report(f"{name} -> .table", legacy_seconds, table_seconds)
+
+
+def bench_dedup():
+    """process_backup_data 去重：逐组 iterrows vs drop_duplicates"""
+    print("== backup 数据去重 (deduplicate_entries) ==")
+    df = read_timetable(BACKUP_FILE)
+    legacy_seconds, expected = timeit(lambda: legacy_deduplicate_entries(df), repeat=1)
+    current_seconds, actual = timeit(lambda: deduplicate_entries(df), repeat=5)
+    pd.testing.assert_frame_equal(actual, expected)
+    report(f"{len(df)} 行 -> {len(actual)} 行", legacy_seconds, current_seconds)
+
+
+def load_processor():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CourseDataProcessor(TIMETABLE_FILE)
+
+
+def bench_search():
+    """search_courses：全量扫描 vs n-gram 倒排索引"""
+    print("== 课程搜索 (search_courses) ==")
+    processor = load_processor()
+    semester_courses = processor.get_courses_by_semester('Sem1')
+    cases = [
+        ('', ''), ('c', ''), ('co', ''), ('eng', ''), ('comp', ''),
+        ('intro', ''), ('financial', ''), ('introduction to', ''),
+        ('comp3', ''), ('zzzz', ''), ('', 'ENGINEERING'), ('data', 'Faculty of'),
+    ]
+    for query, department in cases:
+        expected = legacy_search_courses(semester_courses, query, department)
+        actual = processor.search_courses(query, department, 'Sem1')
+        assert actual == expected, f"搜索结果不一致: {query!r} {department!r}"
+        legacy_seconds, _ = timeit(
+            lambda: legacy_search_courses(semester_courses, query, department), repeat=20
+        )
+        current_seconds, _ = timeit(
+            lambda: processor.search_courses(query, department, 'Sem1'), repeat=20
+        )
+        label = f"query={query!r} dept={department!r} -> {len(expected)}"
+        report(label, legacy_seconds, current_seconds)
+
+
+def bench_paging():
+    """/api/courses 分页：生成全部结果后切片 vs 只取当前页"""
+    print("== 分页搜索 (search_courses_page) ==")
+    processor = load_processor()
+    semester_courses = processor.get_courses_by_semester('Sem1')
+    for query, page in (('', 1), ('', 40), ('', 117), ('c', 40), ('intro', 3)):
+        start = (page - 1) * 20
+
+        def legacy():
+            results = legacy_search_courses(semester_courses, query)
+            return results[start:start + 20], len(results)
+
+        legacy_seconds, expected = timeit(legacy, repeat=20)
+        current_seconds, actual = timeit(
+            lambda: processor.search_courses_page(query, '', 'Sem1', page, 20), repeat=20
+        )
+        assert actual == expected, f"分页结果不一致: {query!r} 第 {page} 页"
+        report(f"query={query!r} page={page} (共 {expected[1]})", legacy_seconds, current_seconds)
+
+
+def random_schedule(processor, semester, slot_count, rng):
+    """从真实数据中随机挑选subclass，直到时间段数量达到 slot_count"""
+    items = [
+        (code, label, sum(len(slot.days) for slot in subclass.time_slots))
+        for code, course in processor.get_courses_by_semester(semester).items()
+        for label, subclass in course.subclasses.items()
+    ]
+    schedule = []
+    total = 0
+    while total < slot_count:
+        code, label, count = rng.choice(items)
+        if count:
+            schedule.append({'course_code': code, 'subclass': label})
+            total += count
+    return schedule
+
+
+def bench_conflicts():
+    """get_time_conflict：逐对比较 vs 按天排序扫描"""
+    print("== 时间冲突检测 (get_time_conflict) ==")
+    processor = load_processor()
+    rng = random.Random(2025)
+    for slot_count in (5, 10, 25, 50, 100, 250, 500):
+        schedule = random_schedule(processor, 'Sem1', slot_count, rng)
+        repeat = 3 if slot_count >= 250 else 10
+        legacy_seconds, expected = timeit(
+            lambda: legacy_get_time_conflict(processor, schedule, 'Sem1'), repeat=repeat
+        )
+        current_seconds, actual = timeit(
+            lambda: processor.get_time_conflict(schedule, 'Sem1'), repeat=repeat
+        )
+        assert actual == expected, f"{slot_count} 个时间段: 冲突结果不一致"
+        report(f"{slot_count} 个时间段 -> {len(expected)} 个冲突", legacy_seconds, current_seconds)
+
+
+def bench_occupancy():
+    """添加课程时的冲突判断：逐个时间段比较 vs 占用位图按位与"""
+    print("== 占用位图 (Subclass.occupancy) ==")
+    processor = load_processor()
+    rng = random.Random(2025)
+
+    # 等价性：随机 subclass 两两之间，位图判断与逐个时间段比较的结果一致
+    for semester in processor.get_available_semesters():
+        items = [
+            (code, label)
+            for code, course in processor.get_courses_by_semester(semester).items()
+            for label in course.subclasses
+        ]
+        sample = rng.sample(items, min(len(items), 400))
+        checked = 0
+        for (code, label), (other_code, other_label) in itertools.combinations(sample, 2):
+            schedule = [{'course_code': code, 'subclass': label},
+                        {'course_code': other_code, 'subclass': other_label}]
+            expected = bool(legacy_get_time_conflict(processor, schedule, semester))
+            actual = bool(processor.get_time_conflict(schedule, semester))
+            assert actual == expected, f"{semester}: {code} {label} / {other_code} {other_label} 冲突判断不一致"
+            checked += 1
+        print(f"  {semester}: {checked} 对 subclass 的冲突判断与旧实现一致")
+
+    # 在已有 n 门课的日程表中再添加一门课
+    for size in (3, 6, 10):
+        schedule = random_schedule(processor, 'Sem1', size * 3, rng)[:size]
+        candidates = random_schedule(processor, 'Sem1', 100, rng)
+
+        def check(get_conflicts):
+            return [bool(get_conflicts(schedule + [item])) for item in candidates]
+
+        legacy_seconds, expected = timeit(
+            lambda: check(lambda new: legacy_get_time_conflict(processor, new, 'Sem1')), repeat=5
+        )
+        current_seconds, actual = timeit(
+            lambda: check(lambda new: processor.get_time_conflict(new, 'Sem1')), repeat=5
+        )
+        assert actual == expected, "添加课程时的冲突判断不一致"
+        report(f"日程表 {size} 门课, 尝试添加 {len(candidates)} 次", legacy_seconds, current_seconds)
+
+
+def legacy_fits_schedule(processor, semester_courses, schedule, semester):
+    """逐门课程、逐个subclass用 get_time_conflict 检查能否加入日程表"""
+    fitting = []
+    for code, course in semester_courses.items():
+        others = [item for item in schedule if item['course_code'] != code]
+        for label in course.subclasses:
+            new_schedule = others + [{'course_code': code, 'subclass': label}]
+            conflicts = legacy_get_time_conflict(processor, new_schedule, semester)
+            if not any(f"{code} ({label})" in pair for pair in conflicts):
+                fitting.append(course)
+                break
+    return fitting
+
+
+def bench_fits():
+    """按日程表筛选课程：逐个subclass检查冲突 vs 占用位图"""
+    print("== 按日程表筛选 (search_courses fits_schedule) ==")
+    processor = load_processor()
+    rng = random.Random(2025)
+    semester_courses = processor.get_courses_by_semester('Sem1')
+    for size in (0, 3, 6):
+        schedule = []
+        for code, course in rng.sample(list(semester_courses.items()), len(semester_courses)):
+            if len(schedule) >= size:
+                break
+            label = rng.choice(list(course.subclasses))
+            candidate = schedule + [{'course_code': code, 'subclass': label}]
+            if not processor.get_time_conflict(candidate, 'Sem1'):
+                schedule = candidate
+        for query in ('', 'comp'):
+            courses = processor.search_courses(query, '', 'Sem1')
+            legacy_seconds, expected = timeit(
+                lambda: legacy_fits_schedule(
+                    processor, {course.code: course for course in courses}, schedule, 'Sem1'
+                ), repeat=1
+            )
+            current_seconds, actual = timeit(
+                lambda: processor.search_courses(query, '', 'Sem1', fits_schedule=schedule), repeat=10
+            )
+            assert actual == expected, f"日程表 {size} 门课 query={query!r}: 筛选结果不一致"
+            unfiltered_seconds, _ = timeit(lambda: processor.search_courses(query, '', 'Sem1'), repeat=10)
+            report(f"日程表 {size} 门课 query={query!r} -> {len(actual)}/{len(courses)} "
+                   f"(不筛选 {unfiltered_seconds * 1000:.2f} ms)", legacy_seconds, current_seconds)
+
+
+def legacy_courses_within(semester_courses, windows):
+    """逐门课程扫描所有时间段，找出全部上课时间都被 windows 覆盖的subclass"""
+    # 窗口覆盖的 (星期, 分钟)；相接或重叠的窗口合起来覆盖一个时间段也算落在窗口内
+    covered = {
+        (DAYS[day], minute) for day, start, end in windows for minute in range(start, end)
+    }
+
+    def inside(day, slot):
+        start, end = slot.start_minutes, slot.end_minutes
+        if start is None or end is None:
+            return False
+        if start >= end:
+            return any(DAYS[window_day] == day and window_start <= start <= window_end
+                       for window_day, window_start, window_end in windows)
+        return all((day, minute) in covered for minute in range(start, end))
+
+    matches = []
+    for course in semester_courses.values():
+        labels = []
+        for label, subclass in course.subclasses.items():
+            slot_days = [(day, slot) for slot in subclass.time_slots for day in slot.days]
+            if slot_days and all(inside(day, slot) for day, slot in slot_days):
+                labels.append(label)
+        if labels:
+            matches.append((course, labels))
+    return matches
+
+
+def bench_free():
+    """按空闲时间查找课程：逐门课程扫描 vs 每天的区间索引"""
+    print("== 按空闲时间查找课程 (find_courses_within) ==")
+    processor = load_processor()
+    rng = random.Random(2025)
+    cases = [
+        ('TUE 14:00-18:00', [parse_time_window('TUE 14:00-18:00')]),
+        ('TUE 14:00-18:00 + THU 上午', [parse_time_window('TUE 14:00-18:00'),
+                                       parse_time_window('THU 08:00-12:00')]),
+        ('周一至周五全天', [parse_time_window(day) for day in DAYS[:5]]),
+    ]
+    for semester in ('Sem1', 'Sem2'):
+        semester_courses = processor.get_courses_by_semester(semester)
+        # 随机窗口（含重叠和相接的窗口）只检查结果一致
+        for _ in range(200):
+            windows = []
+            for _ in range(rng.randint(1, 4)):
+                start = rng.randrange(8 * 60, 20 * 60, 30)
+                windows.append((rng.randrange(len(DAYS)), start, start + rng.randrange(30, 6 * 60, 30)))
+            assert processor.find_courses_within(windows, semester) == \
+                legacy_courses_within(semester_courses, windows), f"{semester} {windows}: 结果不一致"
+        for name, windows in cases:
+            legacy_seconds, expected = timeit(lambda: legacy_courses_within(semester_courses, windows))
+            current_seconds, actual = timeit(lambda: processor.find_courses_within(windows, semester),
+                                             repeat=20)
+            assert actual == expected, f"{semester} {name}: 结果不一致"
+            report(f"{semester} {name} -> {len(actual)} 门", legacy_seconds, current_seconds)
+
+
+def bench_schedule_store():
+    """日程表读写的每请求开销：签名 cookie session vs session 中的ID + 日程表存储"""
+    print("== 日程表存储 (cookie session vs schedule_store) ==")
+    processor = load_processor()
+    app = Flask(__name__)
+    app.secret_key = 'benchmark'
+    serializer = SecureCookieSessionInterface().get_signing_serializer(app)
+    rng = random.Random(2025)
+    semester_courses = processor.get_courses_by_semester('Sem1')
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            'SQLite': SQLiteScheduleStore(os.path.join(tmp, 'schedules.sqlite3')),
+            '内存': MemoryScheduleStore(),
+        }
+        for size in (3, 6, 10):
+            schedule = []
+            for course in rng.sample(list(semester_courses.values()), size):
+                schedule.append({
+                    'course_code': course.code,
+                    'subclass': next(iter(course.subclasses)),
+                    'course_title': course.title,
+                    'semester': 'Sem1'
+                })
+            cookie = serializer.dumps({'schedule_Sem1': schedule})
+
+            # 旧实现：每个请求验证并解析整个 cookie，修改日程表时重新签名
+            def legacy_read():
+                return serializer.loads(cookie)['schedule_Sem1']
+
+            def legacy_write():
+                return serializer.dumps({'schedule_Sem1': legacy_read()})
+
+            schedule_id = new_schedule_id()
+            id_cookie = serializer.dumps({'schedule_id': schedule_id})
+            entries = [processor.schedule_entry(item['course_code'], item['subclass'], 'Sem1')
+                       for item in schedule]
+            print(f"  {size} 门课: cookie {len(cookie)} 字节 -> {len(id_cookie)} 字节")
+            for name, store in stores.items():
+                store.save(schedule_id, 'Sem1', entries)
+
+                def read():
+                    session = serializer.loads(id_cookie)
+                    return processor.resolve_schedule(store.load(session['schedule_id'], 'Sem1'), 'Sem1')
+
+                def write():
+                    store.save(schedule_id, 'Sem1', [
+                        processor.schedule_entry(item['course_code'], item['subclass'], 'Sem1')
+                        for item in read()
+                    ])
+
+                legacy_seconds, expected = timeit(legacy_read, repeat=200)
+                current_seconds, actual = timeit(read, repeat=200)
+                assert actual == expected, f"{size} 门课 {name}: 读取的日程表不一致"
+                report(f"  读取 ({name})", legacy_seconds, current_seconds)
+                legacy_seconds, _ = timeit(legacy_write, repeat=200)
+                current_seconds, _ = timeit(write, repeat=200)
+                report(f"  保存 ({name})", legacy_seconds, current_seconds)
+
+
+def bench_cache():
+    """缓存加载：pickle vs 列式缓存文件"""
+    print("== 缓存加载 (_load_from_cache) ==")
+    # 与旧版写入 pickle 时一样，使用刚处理完的字典结构
+    with contextlib.redirect_stdout(io.StringIO()):
+        courses = processor_from_dataframe(read_timetable(TIMETABLE_FILE)).process_courses()
+    course_dicts = as_dicts(courses)
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, 'courses.pickle')
+        cache_path = os.path.join(tmp, 'courses.cache')
+        with open(pickle_path, 'wb') as f:
+            pickle.dump({'processed_courses': course_dicts, 'timestamp': datetime.now()}, f)
+        save_courses(cache_path, courses, CACHE_VERSION)
+
+        def load_pickle():
+            with open(pickle_path, 'rb') as f:
+                return pickle.load(f)['processed_courses']
+
+        legacy_seconds, expected = timeit(load_pickle, repeat=10)
+        current_seconds, actual = timeit(lambda: load_courses(cache_path, CACHE_VERSION), repeat=10)
+        assert actual == courses and as_dicts(actual) == expected, "缓存读取结果不一致"
+        report(f"pickle {os.path.getsize(pickle_path) // 1024} KB -> "
+               f"列式 {os.path.getsize(cache_path) // 1024} KB", legacy_seconds, current_seconds)
+
+
+def traced_size(build):
+    """返回 build() 的结果在保留期间占用的内存（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_memory():
+    """课程数据内存：嵌套字典 vs __slots__ 模型"""
+    print("== 课程数据内存 (processed_courses) ==")
+    df = read_timetable(TIMETABLE_FILE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy_bytes = traced_size(lambda: legacy_process_courses(df))
+        # 先处理一次，使 pandas 等一次性初始化的内部缓存不计入模型的内存
+        processor_from_dataframe(df).process_courses()
+        model_bytes = traced_size(lambda: processor_from_dataframe(df).process_courses())
+    print(f"  旧版嵌套字典:                {legacy_bytes / 1024 / 1024:6.1f} MB")
+    print(f"  __slots__ 模型 + 字符串驻留: {model_bytes / 1024 / 1024:6.1f} MB  "
+          f"(比旧版减少 {1 - model_bytes / legacy_bytes:.0%})")
+
+
+def read_memory_kb(pid):
+    """读取进程的 Rss / Pss / Private 内存（KB）"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                values[name] = int(rest.split()[0])
+    return values['Rss'], values['Pss'], values['Private_Clean'] + values['Private_Dirty']
+
+
+def gunicorn_memory(preload, workers=4, port=5057):
+    """启动 gunicorn，预热接口后返回各 worker 的内存占用"""
+    env = dict(os.environ, CLASS_PLANNER_PRELOAD='1' if preload else '0')
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+         'app_production:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f'http://127.0.0.1:{port}/class-planner'
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(f'{base_url}/api/semesters', timeout=1)
+                break
+            except OSError:
+                time.sleep(0.1)
+        # 预热：让各个 worker 都访问过全部课程数据
+        for _ in range(workers * 5):
+            for semester in ('Sem1', 'Sem2', 'Summer', 'Other'):
+                urllib.request.urlopen(
+                    f'{base_url}/api/courses?semester={semester}&per_page=5000', timeout=10
+                ).read()
+        with open(f'/proc/{master.pid}/task/{master.pid}/children') as f:
+            worker_pids = [int(pid) for pid in f.read().split()]
+        return [read_memory_kb(pid) for pid in worker_pids]
+    finally:
+        master.terminate()
+        master.wait()
+
+
+def bench_workers():
+    """gunicorn 多 worker：各自加载 vs master 预加载共享"""
+    print("== gunicorn worker 内存 (4 workers) ==")
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("  需要 Linux /proc/<pid>/smaps_rollup，跳过")
+        return
+    for preload in (False, True):
+        memory = gunicorn_memory(preload)
+        rss, pss, private = (sum(column) / len(memory) for column in zip(*memory))
+        label = 'master 预加载 + gc.freeze' if preload else '每个 worker 各自加载'
+        print(f"  {label:<28} 每个 worker 平均  RSS: {rss / 1024:6.1f} MB  "
+              f"PSS: {pss / 1024:6.1f} MB  独占: {private / 1024:6.1f} MB")
+
+
+BENCHMARKS = {
+    'ingest': bench_ingest,
+    'xlsx': bench_xlsx,
+    'dedup': bench_dedup,
+    'search': bench_search,
+    'paging': bench_paging,
+    'conflicts': bench_conflicts,
+    'occupancy': bench_occupancy,
+    'fits': bench_fits,
+    'free': bench_free,
+    'store': bench_schedule_store,
+    'generate': bench_generate,
+    'cache': bench_cache,
+    'memory': bench_memory,
+    'workers': bench_workers,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='课程数据性能基准')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"要运行的基准（默认全部）: {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的基准: {', '.join(unknown)}")
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+课表转换脚本：将课表 xlsx 转换为列式课表数据文件（同名 .table），
+启动时缓存失效也不需要再解析 Excel
+
+用法: uv run python convert_timetable.py [xlsx文件 ...]
+不指定文件时转换 data/ 下文件名日期最新的课表。
+
+CourseDataProcessor 读取 xlsx 时，如果同名 .table 文件记录的源文件哈希
+与 xlsx 内容一致就直接加载它；也可以把 .table 文件路径直接传给 CourseDataProcessor。
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from course_cache import TABLE_SUFFIX, save_table
+from course_data import SOURCE_COLUMNS, file_digest
+from timeslots import DAYS
+from timetable_watcher import find_latest_timetable
+from xlsx_reader import read_xlsx
+
+
+def convert_timetable(xlsx_file):
+    """转换一个 xlsx 文件，返回生成的 .table 文件路径"""
+    table_file = Path(xlsx_file).with_suffix(TABLE_SUFFIX)
+    print(f"读取: {xlsx_file}")
+    start = time.perf_counter()
+    df = read_xlsx(xlsx_file, columns=SOURCE_COLUMNS + DAYS)
+    missing = [name for name in SOURCE_COLUMNS + DAYS if name not in df.columns]
+    if missing:
+        raise ValueError(f"缺少列: {', '.join(missing)}")
+    save_table(table_file, df, source_digest=file_digest(xlsx_file))
+    print(f"保存到: {table_file} ({len(df)} 行, {table_file.stat().st_size // 1024} KB, "
+          f"{time.perf_counter() - start:.2f} 秒)")
+    return table_file
+
+
+def main():
+    xlsx_files = sys.argv[1:] or [find_latest_timetable('data')]
+    if xlsx_files == [None]:
+        print("data/ 下没有课表 xlsx 文件")
+        return 1
+    try:
+        for xlsx_file in xlsx_files:
+            convert_timetable(xlsx_file)
+    except Exception as e:
+        print(f"转换过程中出错: {e}")
+        return 1
+    print("\n=== 转换完成 ===")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+课程缓存文件格式：字符串表 + 列式数组
+
+文件布局:
+    MAGIC (8 字节) | 头部长度 uint32 | 头部 JSON | 按 8 字节对齐的数组数据
+
+头部记录格式版本、处理结果的结构版本、源文件内容哈希、学期列表以及每个数组的
+dtype / 偏移 / 长度。读取时通过 mmap 映射数组，但仍要重建全部课程对象，
+加载时间与 pickle 相近；相比 pickle 的收益是可单独读取的头部（版本和哈希校验）和更小的文件。
+
+同一布局也用于课表数据文件（*.table，见 save_table / load_table），
+由 convert_timetable.py 从 xlsx 离线转换，启动时无需再解析 Excel。
+"""
+
+import gc
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from models import Course, Subclass, TimeSlot
+
+MAGIC = b'CPCACHE\x00'
+FORMAT_VERSION = 2
+_ALIGNMENT = 8
+_STRING_SEPARATOR = '\x00'
+
+_COURSE_COLUMNS = ('semester', 'code', 'title', 'department', 'term', 'career', 'subclass_count')
+_SUBCLASS_COLUMNS = ('label', 'section', 'class_number', 'instructor', 'slot_count')
+_SLOT_COLUMNS = ('day_mask', 'start_time', 'end_time', 'start_minutes', 'end_minutes',
+                 'venue', 'instructor')
+
+
+class CacheFormatError(ValueError):
+    """缓存文件不是当前格式或版本"""
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+
+    def add(self, text):
+        string_id = self.ids.get(text)
+        if string_id is None:
+            if _STRING_SEPARATOR in text:
+                raise ValueError(f"字符串中包含分隔符: {text!r}")
+            string_id = self.ids[text] = len(self.ids)
+        return string_id
+
+    def encode(self):
+        return _STRING_SEPARATOR.join(self.ids).encode('utf-8')
+
+
+def _minutes_or_missing(value):
+    return -1 if value is None else value
+
+
+def save_courses(path, processed_courses, schema_version, source_hashes=None, source_digest=None):
+    """将 processed_courses（以及可选的 {课程代码: 源数据哈希}）写入缓存文件"""
+    strings = _StringTable()
+    semesters = list(processed_courses)
+    courses = {name: [] for name in _COURSE_COLUMNS}
+    subclasses = {name: [] for name in _SUBCLASS_COLUMNS}
+    slots = {name: [] for name in _SLOT_COLUMNS}
+
+    for semester_id, semester in enumerate(semesters):
+        for course in processed_courses[semester].values():
+            courses['semester'].append(semester_id)
+            for name in ('code', 'title', 'department', 'term', 'career'):
+                courses[name].append(strings.add(getattr(course, name)))
+            courses['subclass_count'].append(len(course.subclasses))
+
+            for label, subclass in course.subclasses.items():
+                subclasses['label'].append(strings.add(label))
+                for name in ('section', 'class_number', 'instructor'):
+                    subclasses[name].append(strings.add(getattr(subclass, name)))
+                subclasses['slot_count'].append(len(subclass.time_slots))
+
+                for slot in subclass.time_slots:
+                    slots['day_mask'].append(slot.day_mask)
+                    slots['start_minutes'].append(_minutes_or_missing(slot.start_minutes))
+                    slots['end_minutes'].append(_minutes_or_missing(slot.end_minutes))
+                    for name in ('start_time', 'end_time', 'venue', 'instructor'):
+                        slots[name].append(strings.add(getattr(slot, name)))
+
+    source = {'code': [], 'hash': []}
+    for code, content_hash in (source_hashes or {}).items():
+        source['code'].append(strings.add(code))
+        source['hash'].append(content_hash)
+
+    arrays = {'strings': np.frombuffer(strings.encode(), dtype=np.uint8)}
+    if source_hashes is not None:
+        arrays['source.code'] = np.asarray(source['code'], dtype=np.int32)
+        arrays['source.hash'] = np.asarray(source['hash'], dtype=np.uint64)
+    for prefix, columns in (('course', courses), ('subclass', subclasses), ('slot', slots)):
+        for name, values in columns.items():
+            dtype = np.int16 if name.endswith('_minutes') or name == 'day_mask' else np.int32
+            arrays[f'{prefix}.{name}'] = np.asarray(values, dtype=dtype)
+
+    _write_file(path, MAGIC, {
+        'schema_version': schema_version,
+        'source_digest': source_digest,
+        'semesters': semesters,
+    }, arrays)
+
+
+def _write_file(path, magic, fields, arrays):
+    """写入 magic | 头部 | 数组数据，头部包含 fields 和数组布局"""
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'offset': offset, 'length': len(array)}
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+    header = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        **fields,
+        'arrays': layout,
+    }).encode('utf-8')
+    prefix = magic + struct.pack('<I', len(header)) + header
+    data_start = -(-len(prefix) // _ALIGNMENT) * _ALIGNMENT
+
+    # 先写临时文件再替换：多个进程同时写缓存时，读者只会看到完整的文件
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(prefix.ljust(data_start, b'\x00'))
+            for name, array in arrays.items():
+                f.write(array.tobytes())
+                f.write(b'\x00' * (-array.nbytes % _ALIGNMENT))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_header(buffer, magic=MAGIC):
+    """解析并校验头部，返回 (头部, 数组数据起始偏移)"""
+    if buffer[:len(magic)] != magic:
+        raise CacheFormatError("不是课程缓存文件" if magic == MAGIC else "不是课表数据文件")
+    (header_length,) = struct.unpack_from('<I', buffer, len(magic))
+    header_start = len(magic) + 4
+    header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+    if header['format_version'] != FORMAT_VERSION:
+        raise CacheFormatError(f"缓存格式版本 {header['format_version']} 不受支持")
+    data_start = -(-(header_start + header_length) // _ALIGNMENT) * _ALIGNMENT
+    return header, data_start
+
+
+def read_cache_header(path, magic=MAGIC):
+    """只读取缓存文件的头部"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return read_header(buffer, magic)[0]
+
+
+def map_arrays(buffer, magic=MAGIC):
+    """返回 (头部, {数组名: 映射到 buffer 上的 numpy 数组})，不复制数据"""
+    header, data_start = read_header(buffer, magic)
+    arrays = {
+        name: np.frombuffer(buffer, dtype=np.dtype(spec['dtype']), count=spec['length'],
+                            offset=data_start + spec['offset'])
+        for name, spec in header['arrays'].items()
+    }
+    return header, arrays
+
+
+def _check_schema(header, schema_version):
+    if header['schema_version'] != schema_version:
+        raise CacheFormatError(
+            f"缓存结构版本 {header['schema_version']} 与当前版本 {schema_version} 不一致"
+        )
+
+
+def _read_columns(path, schema_version, prefixes):
+    """读取字符串表和名称以 prefixes 开头的数组，返回 (头部, 字符串列表, {名称: list})"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        header, arrays = map_arrays(buffer)
+        _check_schema(header, schema_version)
+        strings = arrays.pop('strings').tobytes().decode('utf-8').split(_STRING_SEPARATOR)
+        columns = {
+            name: array.tolist() for name, array in arrays.items() if name.startswith(prefixes)
+        }
+        del arrays
+    return header, strings, columns
+
+
+def load_source_hashes(path, schema_version):
+    """读取缓存中的 {课程代码: 源数据哈希}，缓存未记录时返回 None"""
+    header, strings, columns = _read_columns(path, schema_version, ('source.',))
+    if 'source.code' not in columns:
+        return None
+    return {strings[i]: value for i, value in zip(columns['source.code'], columns['source.hash'])}
+
+
+def load_courses(path, schema_version):
+    """读取缓存文件，重建 processed_courses"""
+    header, strings, columns = _read_columns(path, schema_version, ('course.', 'subclass.', 'slot.'))
+
+    # 重建期间只会新建对象、不会产生循环引用，暂停GC避免反复扫描
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return build_courses(header['semesters'], strings, columns)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def build_courses(semesters, strings, columns):
+    """由字符串表和列数据重建课程模型"""
+    lookup = strings.__getitem__
+
+    def text(name):
+        return list(map(lookup, columns[name]))
+
+    def minutes(name):
+        return [None if value < 0 else value for value in columns[name]]
+
+    slots = list(map(
+        TimeSlot,
+        columns['slot.day_mask'], text('slot.start_time'), text('slot.end_time'),
+        minutes('slot.start_minutes'), minutes('slot.end_minutes'),
+        text('slot.venue'), text('slot.instructor')
+    ))
+
+    subclasses = []
+    position = 0
+    for label, section, class_number, instructor, count in zip(
+        text('subclass.label'), text('subclass.section'), text('subclass.class_number'),
+        text('subclass.instructor'), columns['subclass.slot_count']
+    ):
+        subclasses.append((label, Subclass(
+            label, section, class_number, instructor, tuple(slots[position:position + count])
+        )))
+        position += count
+
+    processed_courses = {semester: {} for semester in semesters}
+    position = 0
+    for semester_id, code, title, department, term, career, count in zip(
+        columns['course.semester'], text('course.code'), text('course.title'),
+        text('course.department'), text('course.term'), text('course.career'),
+        columns['course.subclass_count']
+    ):
+        semester = semesters[semester_id]
+        processed_courses[semester][code] = Course(
+            code, title, department, term, career, semester,
+            dict(subclasses[position:position + count])
+        )
+        position += count
+
+    return processed_courses
+
+
+# ---------------------------------------------------------------------------
+# 课表数据文件：由 xlsx 离线转换得到的列式表格，与缓存文件使用相同的布局
+# ---------------------------------------------------------------------------
+
+TABLE_MAGIC = b'CPTABLE\x00'
+TABLE_SUFFIX = '.table'
+
+
+def save_table(path, df, source_digest=None):
+    """将 DataFrame 按列写入课表数据文件
+
+    数值和布尔列按原 dtype 保存；其余列按字符串保存（缺失值除外），
+    与处理课程时对这些列的使用方式一致。
+    """
+    strings = _StringTable()
+    arrays = {}
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if column.dtype.kind in 'biuf':
+            kind = 'values'
+            arrays[f'table.{name}'] = column.to_numpy()
+        else:
+            kind = 'strings'
+            present = column.notna().to_numpy()
+            arrays[f'table.{name}'] = np.asarray([
+                strings.add(str(value)) if is_present else -1
+                for value, is_present in zip(column.tolist(), present)
+            ], dtype=np.int32)
+        columns.append({'name': name, 'kind': kind})
+    arrays = {'strings': np.frombuffer(strings.encode(), dtype=np.uint8), **arrays}
+
+    _write_file(path, TABLE_MAGIC, {
+        'source_digest': source_digest,
+        'columns': columns,
+    }, arrays)
+
+
+def load_table(path):
+    """读取课表数据文件，返回 DataFrame"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        header, arrays = map_arrays(buffer, TABLE_MAGIC)
+        strings = arrays.pop('strings').tobytes().decode('utf-8').split(_STRING_SEPARATOR)
+        # 末尾追加的 NaN 供编号 -1 取用
+        lookup = np.array(strings + [np.nan], dtype=object)
+        data = {
+            column['name']: (
+                arrays[f"table.{column['name']}"].copy() if column['kind'] == 'values'
+                else lookup[arrays[f"table.{column['name']}"]]
+            )
+            for column in header['columns']
+        }
+        del arrays
+    return pd.DataFrame(data)
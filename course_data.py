@@ -1,24 +1,307 @@
+import numpy as np
 import pandas as pd
+import contextlib
 import string
-from datetime import datetime
-from collections import defaultdict
+import hashlib
+import json
+from collections import Counter
 import re
-import pickle
-import os
+import sys
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows 上不加锁
+    fcntl = None
+
+from course_cache import (
+    TABLE_MAGIC, TABLE_SUFFIX, load_courses, load_source_hashes, load_table, read_cache_header,
+    save_courses
+)
+from models import Course, Subclass, TimeSlot
+from schedule_generator import generate_schedules
+from search_index import SearchIndex, SearchResultCache, TimeWindowIndex
+from timeslots import DAYS, find_conflicts, parse_time_minutes
+from xlsx_reader import read_xlsx
+
+DAY_BIT_VALUES = 1 << np.arange(len(DAYS))
+# 处理结果结构变化时递增，旧版本缓存会被重新生成
+CACHE_VERSION = 2
+
+SEMESTERS = ['Sem1', 'Sem2', 'Summer', 'Other']
+# 影响处理结果的源数据列（上课日期列另外计算）
+SOURCE_COLUMNS = [
+    'COURSE CODE', 'CLASS SECTION', 'CLASS NUMBER', 'START TIME', 'END TIME', 'VENUE',
+    'INSTRUCTOR', 'COURSE TITLE', 'OFFER DEPT', 'TERM', 'ACAD_CAREER'
+]
+
+
+def dump_json(obj):
+    """与 Flask jsonify 相同的紧凑、按键排序的 JSON 编码"""
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def json_etag(body):
+    """JSON 内容的强 ETag"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _str_column(column):
+    """整列转换为字符串列表，缺失值为空字符串；相同的字符串共用一个对象"""
+    present = column.notna().to_numpy()
+    values = column.to_numpy(dtype=object).astype(str)
+    return list(map(sys.intern, np.where(present, values, '').tolist()))
+
+
+def _semester_column(sections):
+    """整列根据CLASS SECTION首字符确定学期"""
+    first_char = sections.astype(str).str[:1]
+    return pd.Series(
+        np.select(
+            [first_char == '1', first_char == '2', first_char == 'S'],
+            ['Sem1', 'Sem2', 'Summer'],
+            default='Other'
+        ),
+        index=sections.index
+    )
+
+
+def _minutes_column(times):
+    """将时间字符串列表解析为分钟数列表（每个不同的字符串只解析一次）"""
+    parsed = {text: parse_time_minutes(text) for text in set(times)}
+    return [parsed[text] for text in times]
+
+
+def _factorize_sorted(column):
+    """返回排序后的唯一值及每行对应的编号"""
+    ids, keys = pd.factorize(column, sort=True)
+    return keys.tolist(), ids
+
+
+def build_courses(df):
+    """由课表 DataFrame 生成 {学期: {课程代码: Course}}，不修改 df
+
+    整列计算上课日期、学期与字符串转换，再经一次排序切分出
+    (课程, 学期, CLASS NUMBER) 分组，避免逐行 iterrows。
+    """
+    courses_by_semester = {semester: {} for semester in SEMESTERS}
+    
+    # 过滤掉无效的课程代码
+    valid_df = df.dropna(subset=['COURSE CODE'])
+    if valid_df.empty:
+        return courses_by_semester
+    
+    # 上课日期：每行一个7位掩码，相同掩码即相同的星期组合
+    day_bits = valid_df[DAYS].notna().to_numpy() @ DAY_BIT_VALUES
+    day_masks = day_bits.tolist()
+    
+    # 字符串列：缺失值为空字符串，其余与 str(value) 一致
+    section = _str_column(valid_df['CLASS SECTION'])
+    start_time = _str_column(valid_df['START TIME'])
+    end_time = _str_column(valid_df['END TIME'])
+    venue = _str_column(valid_df['VENUE'])
+    instructor = _str_column(valid_df['INSTRUCTOR'])
+    class_number = _str_column(valid_df['CLASS NUMBER'])
+    start_minutes = _minutes_column(start_time)
+    end_minutes = _minutes_column(end_time)
+    
+    # 课程基本信息取该课程第一行（跨学期）
+    course_keys, course_ids = _factorize_sorted(valid_df['COURSE CODE'])
+    semester_keys, semester_ids = _factorize_sorted(_semester_column(valid_df['CLASS SECTION']))
+    first_rows = np.unique(course_ids, return_index=True)[1]
+    titles = _str_column(valid_df['COURSE TITLE'])
+    departments = _str_column(valid_df['OFFER DEPT'])
+    terms = _str_column(valid_df['TERM'])
+    careers = _str_column(valid_df['ACAD_CAREER'])
+    
+    # CLASS NUMBER 按首次出现的顺序编号，保证subclass顺序与原始数据一致
+    class_ids = pd.Series(class_number).groupby(
+        [course_ids, semester_ids, class_number], sort=False
+    ).ngroup().to_numpy()
+    
+    # 同一 CLASS NUMBER 中相同的星期组合只保留第一次出现的行
+    keep = ~pd.DataFrame({'c': class_ids, 'd': day_bits}).duplicated().to_numpy()
+    
+    # 一次稳定排序，按 (课程, 学期, CLASS NUMBER) 聚集行
+    order = np.lexsort((class_ids, semester_ids, course_ids))
+    order = order[keep[order]]
+    sorted_course = course_ids[order]
+    sorted_semester = semester_ids[order]
+    sorted_class = class_ids[order]
+    
+    # 分组边界
+    n = len(order)
+    class_starts = np.flatnonzero(np.r_[True, sorted_class[1:] != sorted_class[:-1]])
+    class_ends = np.r_[class_starts[1:], n]
+    
+    current_key = None
+    subclasses = None
+    for start, stop in zip(class_starts.tolist(), class_ends.tolist()):
+        course_id = int(sorted_course[start])
+        semester_id = int(sorted_semester[start])
+        if (course_id, semester_id) != current_key:
+            current_key = (course_id, semester_id)
+            course_code = course_keys[course_id]
+            semester = semester_keys[semester_id]
+            info_row = first_rows[course_id]
+            subclasses = {}
+            courses_by_semester[semester][course_code] = Course(
+                code=course_code,
+                title=titles[info_row],
+                department=departments[info_row],
+                term=terms[info_row],
+                career=careers[info_row],
+                semester=semester,
+                subclasses=subclasses
+            )
+        
+        rows = order[start:stop].tolist()
+        first = rows[0]
+        time_slots = tuple(TimeSlot(
+            day_mask=day_masks[row],
+            start_time=start_time[row],
+            end_time=end_time[row],
+            start_minutes=start_minutes[row],
+            end_minutes=end_minutes[row],
+            venue=venue[row],
+            instructor=instructor[row]
+        ) for row in rows)
+        
+        # 使用第一行的section作为subclass标识
+        subclass_label = section[first]
+        subclasses[subclass_label] = Subclass(
+            label=subclass_label,
+            section=subclass_label,
+            class_number=class_number[first],
+            instructor=instructor[first],
+            time_slots=time_slots
+        )
+    
+    return courses_by_semester
+
+
+def course_source_hashes(df):
+    """计算每门课程源数据行的内容哈希 {课程代码: int}
+
+    对处理时实际用到的列（转换为字符串后）和上课日期逐行哈希，
+    再按行的原始顺序合并为课程级哈希；哈希相同则处理结果相同。
+    """
+    valid_df = df.dropna(subset=['COURSE CODE'])
+    if valid_df.empty:
+        return {}
+    
+    frame = pd.DataFrame({name: _str_column(valid_df[name]) for name in SOURCE_COLUMNS})
+    frame['DAYS'] = valid_df[DAYS].notna().to_numpy() @ DAY_BIT_VALUES
+    row_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    
+    course_keys, course_ids = _factorize_sorted(valid_df['COURSE CODE'])
+    order = np.argsort(course_ids, kind='stable')
+    starts = np.flatnonzero(np.r_[True, course_ids[order][1:] != course_ids[order][:-1]])
+    hashes = {}
+    for course_code, rows in zip(course_keys, np.split(order, starts[1:])):
+        digest = hashlib.blake2b(row_hashes[rows].tobytes(), digest_size=8).digest()
+        hashes[course_code] = int.from_bytes(digest, 'little')
+    return hashes
+
+
+def _schedule_entry(course_code, class_number):
+    return f'{course_code}/{class_number}'
+
+
+def _schedule_entries(semester_courses):
+    """{日程表存储中的课程标识: (课程代码, subclass label)}
+
+    标识为 '课程代码/class number'：class number 可能在学期内重复（Other 中不同学期的课程），
+    新课表也可能把旧的 class number 分配给别的课程，只有课程代码和 class number
+    都一致时才认为是同一个 subclass。
+    """
+    return {
+        _schedule_entry(code, subclass.class_number): (code, label)
+        for code, course in semester_courses.items()
+        for label, subclass in course.subclasses.items()
+    }
+
+
+@contextlib.contextmanager
+def _cache_lock(cache_file):
+    """缓存文件的进程间排他锁
+
+    多个 worker 同时加载同一课表（如热更新时各自的监视线程）时，只有一个进程
+    处理源文件并写缓存，其余进程等待锁释放后直接读取刚写好的缓存。
+    """
+    if fcntl is None:
+        yield
+        return
+    lock_file = None
+    try:
+        lock_file = open(f'{cache_file}.lock', 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+    except OSError as e:
+        # 如 data/ 不可写：与缓存写入失败一样只记录，不加锁继续
+        print(f"缓存锁不可用: {e}, 不加锁继续")
+        if lock_file is not None:
+            lock_file.close()
+        yield
+        return
+    with lock_file:
+        yield
+
+
+def file_digest(path):
+    """源文件内容的哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_digest(path):
+    """课表的内容哈希：xlsx 为文件本身的哈希，课表数据文件为头部记录的源 xlsx 哈希
+
+    xlsx 和由它转换的 .table 因此共用同一个缓存，不会互相使对方的缓存失效；
+    头部没有记录源哈希时使用文件本身的哈希。
+    """
+    if Path(path).suffix == TABLE_SUFFIX:
+        recorded = read_cache_header(path, TABLE_MAGIC).get('source_digest')
+        if recorded:
+            return recorded
+    return file_digest(path)
+
+
 class CourseDataProcessor:
     def __init__(self, xlsx_file_path):
         self.xlsx_file_path = xlsx_file_path
         self.df = None
         self.processed_courses = None
+        # 课程代码 -> 源数据内容哈希，用于下次课表更新时增量处理
+        self.source_hashes = None
+        # 最近一次增量处理的变化报告 {'added': [...], 'removed': [...], 'modified': [...]}
+        self.last_changes = None
+        self.search_indexes = {}
+        self.time_window_indexes = {}
+        # 学期 -> {日程表存储中的课程标识: (课程代码, subclass label)}
+        self.schedule_entries = {}
+        self.search_cache = SearchResultCache()
+        self.department_counts = {}
+        # (semester, course_code) -> (JSON bytes, ETag)，首次请求时生成
+        self._course_json = {}
         self.cache_file = Path(xlsx_file_path).with_suffix('.cache')
+        # 源文件内容哈希：记录在缓存头部，用于判断缓存是否仍然有效
+        self.source_digest = source_digest(xlsx_file_path)
+        # 数据版本：源文件内容和处理结果结构不变时保持不变，用于生成接口的ETag
+        self.data_version = hashlib.blake2b(
+            f'{CACHE_VERSION}:{self.source_digest}'.encode('utf-8'), digest_size=16
+        ).hexdigest()
         
         # 尝试从缓存加载，如果缓存不存在或过期则重新加载
-        if self._should_reload_cache():
-            self._load_and_process_data()
-        else:
-            self._load_from_cache()
+        with _cache_lock(self.cache_file):
+            if self._should_reload_cache():
+                self._load_and_process_data()
+            else:
+                self._load_from_cache()
+        
+        self._build_indexes()
         
     def get_semester_from_section(self, section):
         """从CLASS SECTION确定学期"""
@@ -33,50 +316,96 @@ class CourseDataProcessor:
             return 'Other'
     
     def _should_reload_cache(self):
-        """检查是否需要重新加载缓存"""
+        """检查是否需要重新加载缓存
+
+        比较缓存头部记录的源文件哈希和结构版本，而不是修改时间：
+        git pull / rsync 只更新了修改时间时仍然使用缓存，
+        复制进来的旧缓存与当前文件内容不一致时不会被误用。
+        """
         if not self.cache_file.exists():
             return True
         
-        # 检查Excel文件是否比缓存文件新
-        xlsx_mtime = os.path.getmtime(self.xlsx_file_path)
-        cache_mtime = os.path.getmtime(self.cache_file)
-        return xlsx_mtime > cache_mtime
+        try:
+            header = read_cache_header(self.cache_file)
+        except Exception as e:
+            print(f"缓存头部读取失败: {e}")
+            return True
+        return (header.get('schema_version') != CACHE_VERSION
+                or header.get('source_digest') != self.source_digest)
     
     def _load_from_cache(self):
         """从缓存文件加载数据"""
         try:
-            with open(self.cache_file, 'rb') as f:
-                cache_data = pickle.load(f)
-                self.processed_courses = cache_data['processed_courses']
-                print(f"从缓存加载数据: {self.cache_file}")
+            self.processed_courses = load_courses(self.cache_file, CACHE_VERSION)
+            self.source_hashes = load_source_hashes(self.cache_file, CACHE_VERSION)
+            print(f"从缓存加载数据: {self.cache_file}")
         except Exception as e:
             print(f"缓存加载失败: {e}, 重新处理数据")
             self._load_and_process_data()
     
+    def _load_previous_cache(self):
+        """读取已过期的缓存，返回 (processed_courses, source_hashes)，不可用时返回 None"""
+        if not self.cache_file.exists():
+            return None
+        try:
+            previous_hashes = load_source_hashes(self.cache_file, CACHE_VERSION)
+            if previous_hashes is None:
+                return None
+            return load_courses(self.cache_file, CACHE_VERSION), previous_hashes
+        except Exception as e:
+            print(f"旧缓存不可用于增量处理: {e}")
+            return None
+    
     def _save_to_cache(self):
         """保存数据到缓存文件"""
         try:
-            cache_data = {
-                'processed_courses': self.processed_courses,
-                'timestamp': datetime.now()
-            }
-            with open(self.cache_file, 'wb') as f:
-                pickle.dump(cache_data, f)
+            save_courses(self.cache_file, self.processed_courses, CACHE_VERSION,
+                         source_hashes=self.source_hashes, source_digest=self.source_digest)
             print(f"数据已缓存到: {self.cache_file}")
         except Exception as e:
             print(f"缓存保存失败: {e}")
     
+    def _read_source(self):
+        """读取源数据：课表数据文件直接加载，xlsx 优先使用内容一致的同名 .table 文件"""
+        path = Path(self.xlsx_file_path)
+        if path.suffix == TABLE_SUFFIX:
+            print(f"加载课表数据文件: {path}")
+            return load_table(path)
+        
+        table_path = path.with_suffix(TABLE_SUFFIX)
+        if table_path.exists():
+            try:
+                header = read_cache_header(table_path, TABLE_MAGIC)
+                if header.get('source_digest') == self.source_digest:
+                    print(f"加载课表数据文件: {table_path}")
+                    return load_table(table_path)
+                print(f"课表数据文件与 {path.name} 内容不一致，忽略: {table_path}")
+            except Exception as e:
+                print(f"课表数据文件读取失败: {e}")
+        
+        print(f"加载Excel文件: {path}")
+        try:
+            # 只流式解析处理用到的列，结果与 pd.read_excel 相同
+            return read_xlsx(path, columns=SOURCE_COLUMNS + DAYS)
+        except Exception as e:
+            print(f"快速读取失败: {e}, 改用 pandas 读取")
+            return pd.read_excel(path)
+    
     def _load_and_process_data(self):
         """加载Excel文件并处理数据"""
-        print(f"加载Excel文件: {self.xlsx_file_path}")
-        self.df = pd.read_excel(self.xlsx_file_path)
+        self.df = self._read_source()
         
         # 清理列名，移除前后空格
         self.df.columns = self.df.columns.str.strip()
         print(f"处理后的列名: {list(self.df.columns)}")
         
-        # 立即处理数据
-        self.process_courses()
+        # 立即处理数据：有可用的旧缓存时只重新处理变化的课程
+        previous = self._load_previous_cache()
+        if previous:
+            self.process_changed_courses(*previous)
+        else:
+            self.process_courses()
+            self.source_hashes = course_source_hashes(self.df)
         
         # 保存到缓存
         self._save_to_cache()
@@ -85,109 +414,89 @@ class CourseDataProcessor:
         """处理课程数据，按CLASS NUMBER正确分组subclass和time slots"""
         print("开始处理课程数据...")
         
-        courses_by_semester = {
-            'Sem1': {},
-            'Sem2': {},
-            'Summer': {},
-            'Other': {}
-        }
+        # 预处理：添加学期列
+        self.df['SEMESTER'] = _semester_column(self.df['CLASS SECTION'])
+        courses_by_semester = build_courses(self.df)
+        self.processed_courses = courses_by_semester
+        self.source_hashes = None
         
-        # 预处理：添加学期列以提高性能
-        self.df['SEMESTER'] = self.df['CLASS SECTION'].apply(self.get_semester_from_section)
+        # 打印处理统计信息
+        self._print_course_counts()
         
-        # 过滤掉无效的课程代码
-        valid_df = self.df.dropna(subset=['COURSE CODE']).copy()
+        return courses_by_semester
+    
+    def process_changed_courses(self, previous_courses, previous_hashes):
+        """只重新处理源数据有变化的课程，修补上一次的处理结果
+
+        previous_hashes 为上一次处理时的 course_source_hashes，
+        未变化的课程直接沿用 previous_courses 中的对象。
+        """
+        print("开始增量处理课程数据...")
+        hashes = course_source_hashes(self.df)
+        added = sorted(hashes.keys() - previous_hashes.keys())
+        removed = sorted(previous_hashes.keys() - hashes.keys())
+        modified = sorted(
+            code for code in hashes.keys() & previous_hashes.keys()
+            if hashes[code] != previous_hashes[code]
+        )
+        changed = set(added) | set(modified)
+        stale = changed | set(removed)
         
-        # 按课程代码分组处理
-        for course_code, course_group in valid_df.groupby('COURSE CODE'):
-            course_info = course_group.iloc[0]  # 获取课程基本信息
-            
-            # 按学期分组处理 - 使用groupby提高性能
-            for semester, semester_group in course_group.groupby('SEMESTER'):
-                entries = []
-                
-                for _, row in semester_group.iterrows():
-                    # 获取上课日期
-                    days = []
-                    for day in ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']:
-                        if pd.notna(row[day]):
-                            days.append(day)
-                    
-                    # 保留所有entries，包括没有上课日期的（可能是在线课程或特殊课程）
-                    entry = {
-                        'section': str(row['CLASS SECTION']) if pd.notna(row['CLASS SECTION']) else '',
-                        'days': days,
-                        'start_time': str(row['START TIME']) if pd.notna(row['START TIME']) else '',
-                        'end_time': str(row['END TIME']) if pd.notna(row['END TIME']) else '',
-                        'venue': str(row['VENUE']) if pd.notna(row['VENUE']) else '',
-                        'instructor': str(row['INSTRUCTOR']) if pd.notna(row['INSTRUCTOR']) else '',
-                        'class_number': str(row['CLASS NUMBER']) if pd.notna(row['CLASS NUMBER']) else ''
-                    }
-                    entries.append(entry)
-                
-                if entries:  # 只有有entries的学期才创建课程
-                    subclasses = {}
-                    
-                    # 按CLASS NUMBER分组，每个CLASS NUMBER对应一个subclass
-                    entries_by_class_number = defaultdict(list)
-                    for entry in entries:
-                        entries_by_class_number[entry['class_number']].append(entry)
-                    
-                    # 为每个CLASS NUMBER创建一个subclass
-                    for class_number, class_entries in entries_by_class_number.items():
-                        if not class_entries:
-                            continue
-                        
-                        # 使用第一个entry的section作为subclass标识
-                        first_entry = class_entries[0]
-                        subclass_label = first_entry['section']
-                        
-                        # 创建time slots列表，去除重复的星期几
-                        time_slots = []
-                        processed_day_combinations = set()
-                        
-                        for entry in class_entries:
-                            # 将days列表转换为排序后的元组，用作去重的key
-                            day_tuple = tuple(sorted(entry['days']))
-                            
-                            if day_tuple not in processed_day_combinations:
-                                processed_day_combinations.add(day_tuple)
-                                time_slots.append({
-                                    'days': entry['days'],
-                                    'start_time': entry['start_time'],
-                                    'end_time': entry['end_time'],
-                                    'venue': entry['venue'],
-                                    'instructor': entry['instructor']
-                                })
-                        
-                        subclasses[subclass_label] = {
-                            'label': subclass_label,
-                            'section': first_entry['section'],
-                            'class_number': class_number,
-                            'instructor': first_entry['instructor'],
-                            'time_slots': time_slots
-                        }
-                    
-                    courses_by_semester[semester][course_code] = {
-                        'code': course_code,
-                        'title': str(course_info['COURSE TITLE']) if pd.notna(course_info['COURSE TITLE']) else '',
-                        'department': str(course_info['OFFER DEPT']) if pd.notna(course_info['OFFER DEPT']) else '',
-                        'term': str(course_info['TERM']) if pd.notna(course_info['TERM']) else '',
-                        'career': str(course_info['ACAD_CAREER']) if pd.notna(course_info['ACAD_CAREER']) else '',
-                        'semester': semester,
-                        'subclasses': subclasses
-                    }
+        rebuilt = build_courses(self.df[self.df['COURSE CODE'].isin(changed)])
+        courses_by_semester = {}
+        for semester in SEMESTERS:
+            courses = {
+                code: course for code, course in previous_courses.get(semester, {}).items()
+                if code not in stale
+            }
+            courses.update(rebuilt[semester])
+            # 与完整处理一致，按课程代码排序
+            courses_by_semester[semester] = dict(sorted(courses.items()))
         
         self.processed_courses = courses_by_semester
+        self.source_hashes = hashes
+        self.last_changes = {'added': added, 'removed': removed, 'modified': modified}
         
-        # 打印处理统计信息
-        total_courses = sum(len(courses) for courses in courses_by_semester.values())
+        print(f"增量处理完成: 新增 {len(added)} 门, 删除 {len(removed)} 门, "
+              f"修改 {len(modified)} 门, 未变化 {len(hashes) - len(changed)} 门")
+        for label, codes in (('新增', added), ('删除', removed), ('修改', modified)):
+            if codes:
+                shown = ', '.join(codes[:20])
+                print(f"  {label}: {shown}{' ...' if len(codes) > 20 else ''}")
+        self._print_course_counts()
+        
+        return courses_by_semester
+    
+    def _print_course_counts(self):
+        total_courses = sum(len(courses) for courses in self.processed_courses.values())
         print(f"课程处理完成: 共 {total_courses} 门课程")
-        for semester, courses in courses_by_semester.items():
+        for semester, courses in self.processed_courses.items():
             if courses:
                 print(f"  {semester}: {len(courses)} 门课程")
-        
-        return courses_by_semester
+    
+    def _build_indexes(self):
+        """为每个学期建立搜索索引、上课时间区间索引和院系列表，并清空基于旧数据的JSON和搜索结果缓存"""
+        self._course_json = {}
+        self.search_cache.clear()
+        self.search_indexes = {
+            semester: SearchIndex(courses)
+            for semester, courses in self.processed_courses.items()
+        }
+        self.time_window_indexes = {
+            semester: TimeWindowIndex(courses)
+            for semester, courses in self.processed_courses.items()
+        }
+        self.schedule_entries = {
+            semester: _schedule_entries(courses)
+            for semester, courses in self.processed_courses.items()
+        }
+        # 学期 -> 按名称排序的 [(院系, 课程数)]
+        self.department_counts = {
+            semester: sorted(Counter(
+                course.department for course in courses.values() if course.department
+            ).items())
+            for semester, courses in self.processed_courses.items()
+        }
     
     def get_courses_by_semester(self, semester):
         """获取特定学期的课程"""
@@ -196,44 +505,163 @@ class CourseDataProcessor:
             raise RuntimeError("课程数据未正确初始化")
         return self.processed_courses.get(semester, {})
     
-    def search_courses(self, query='', department='', semester='Sem1'):
-        """搜索课程"""
-        semester_courses = self.get_courses_by_semester(semester)
-        
-        results = []
+    def _search_ids(self, index, query, department, semester):
+        """返回匹配课程编号，带筛选条件的搜索结果经 LRU 缓存"""
         query = query.lower() if query else ''
         department = department.upper() if department else ''
+        if not query and not department:
+            return index.search_ids()
         
-        for course_code, course_info in semester_courses.items():
-            # 搜索匹配
-            match = True
-            if query:
-                match = (query in course_code.lower() or 
-                        query in course_info['title'].lower())
-            
-            if department and match:
-                match = department in course_info['department'].upper()
-            
-            if match:
-                results.append(course_info)
+        key = (query, department, semester)
+        doc_ids = self.search_cache.get(key)
+        if doc_ids is None:
+            doc_ids = tuple(index.search_ids(query, department))
+            self.search_cache.put(key, doc_ids)
+        return doc_ids
+    
+    def _fitting_ids(self, index, schedule, semester):
+        """返回至少有一个subclass能加入日程表（与其他课程、与自身都没有时间冲突）的课程编号集合
+
+        日程表中已有的课程按去掉它自己之后的日程表判断。
+        """
+        scheduled = {}
+        for item in schedule:
+            course = self.get_course_by_code_and_semester(item['course_code'], semester)
+            if course and item['subclass'] in course.subclasses:
+                scheduled[item['course_code']] = course.subclasses[item['subclass']]
         
-        return results
+        def is_free(subclass, others):
+            return not subclass.internal_conflict and not any(
+                subclass.conflicts_with(other) for other in others
+            )
+        
+        def fits(course, others):
+            return any(is_free(subclass, others) for subclass in course.subclasses.values())
+        
+        others = list(scheduled.values())
+        if all(subclass.occupancy is not None for subclass in others):
+            occupied = 0
+            for subclass in others:
+                occupied |= subclass.occupancy
+            fitting = index.fitting_ids(occupied, lambda subclass: is_free(subclass, others))
+        else:
+            # 日程表中有无法用位图表示的subclass（很少见），逐门课程比较
+            fitting = {doc_id for doc_id, course in enumerate(index.courses) if fits(course, others)}
+        
+        for code in scheduled:
+            doc_id = index.doc_ids.get(code)
+            if doc_id is None:
+                continue
+            rest = [subclass for other_code, subclass in scheduled.items() if other_code != code]
+            if fits(index.courses[doc_id], rest):
+                fitting.add(doc_id)
+            else:
+                fitting.discard(doc_id)
+        return fitting
+    
+    def _filtered_ids(self, index, query, department, semester, fits_schedule):
+        doc_ids = self._search_ids(index, query, department, semester)
+        if fits_schedule is None:
+            return doc_ids
+        fitting = self._fitting_ids(index, fits_schedule, semester)
+        return [doc_id for doc_id in doc_ids if doc_id in fitting]
+    
+    def search_courses(self, query='', department='', semester='Sem1', fits_schedule=None):
+        """搜索课程
+
+        fits_schedule 为日程表（[{'course_code', 'subclass'}, ...]）时，
+        只返回至少有一个subclass能加入该日程表而不产生时间冲突的课程。
+        """
+        index = self.search_indexes.get(semester)
+        if index is None:
+            return []
+        
+        doc_ids = self._filtered_ids(index, query, department, semester, fits_schedule)
+        return [index.courses[doc_id] for doc_id in doc_ids]
+    
+    def search_courses_page(self, query='', department='', semester='Sem1', page=1, per_page=20,
+                            fits_schedule=None):
+        """分页搜索课程，返回 (当前页的课程列表, 匹配总数)
+
+        只由索引得到匹配编号并计数，只为当前页取出课程对象。fits_schedule 同 search_courses。
+        """
+        index = self.search_indexes.get(semester)
+        if index is None:
+            return [], 0
+        
+        doc_ids = self._filtered_ids(index, query, department, semester, fits_schedule)
+        start_index = (page - 1) * per_page
+        page_ids = doc_ids[start_index:start_index + per_page]
+        return [index.courses[doc_id] for doc_id in page_ids], len(doc_ids)
+    
+    def find_courses_within(self, windows, semester='Sem1'):
+        """查找有subclass的全部上课时间都落在给定时间窗口内的课程
+
+        windows 为 (星期序号, 开始分钟, 结束分钟) 列表，多个窗口取并集。
+        返回 [(课程, [subclass label, ...])]，按学期字典中课程的顺序排列。
+        """
+        index = self.time_window_indexes.get(semester)
+        if index is None:
+            return []
+        return index.search(windows)
+    
+    def schedule_entry(self, course_code, subclass_label, semester):
+        """日程表中一门课程在日程表存储中的标识，课程不存在时返回 None"""
+        course = self.get_course_by_code_and_semester(course_code, semester)
+        if not course or subclass_label not in course.subclasses:
+            return None
+        return _schedule_entry(course_code, course.subclasses[subclass_label].class_number)
+    
+    def resolve_schedule(self, entries, semester):
+        """由日程表存储中的标识还原日程表 [{course_code, subclass, course_title, semester}]
+
+        当前课表中找不到（课程代码与 class number 不再对应）的条目被跳过并记录日志。
+        """
+        lookup = self.schedule_entries.get(semester, {})
+        schedule = []
+        missing = []
+        for entry in entries:
+            if entry not in lookup:
+                missing.append(entry)
+                continue
+            course_code, subclass_label = lookup[entry]
+            schedule.append({
+                'course_code': course_code,
+                'subclass': subclass_label,
+                'course_title': self.get_course_by_code_and_semester(course_code, semester).title,
+                'semester': semester
+            })
+        if missing:
+            print(f"日程表中的课程在当前课表中已不存在 ({semester}): {', '.join(missing)}")
+        return schedule
     
     def get_course_by_code_and_semester(self, course_code, semester):
         """根据课程代码和学期获取课程信息"""
         semester_courses = self.get_courses_by_semester(semester)
         return semester_courses.get(course_code)
     
+    def get_course_json(self, course_code, semester):
+        """返回课程详情的 (JSON bytes, ETag)，课程不存在时返回 None
+
+        课程数据在重新加载前不会变化，因此每门课程只序列化一次。
+        """
+        key = (semester, course_code)
+        cached = self._course_json.get(key)
+        if cached is None:
+            course = self.get_course_by_code_and_semester(course_code, semester)
+            if course is None:
+                return None
+            body = dump_json(course.to_dict())
+            cached = self._course_json[key] = (body, json_etag(body))
+        return cached
+    
     def get_all_departments(self, semester='Sem1'):
         """获取特定学期的所有院系"""
-        semester_courses = self.get_courses_by_semester(semester)
-        
-        departments = set()
-        for course_info in semester_courses.values():
-            if course_info['department']:
-                departments.add(course_info['department'])
-        
-        return sorted(departments)
+        return [department for department, _ in self.department_counts.get(semester, [])]
+    
+    def get_department_counts(self, semester='Sem1'):
+        """获取特定学期的所有院系及其课程数，按院系名称排序"""
+        return self.department_counts.get(semester, [])
     
     def get_available_semesters(self):
         """获取所有可用的学期"""
@@ -246,8 +674,28 @@ class CourseDataProcessor:
                 available.append(semester)
         return available
     
+    def schedule_occupancy(self, schedule, semester):
+        """日程表的一周占用位图（各subclass位图的并集）
+
+        日程表内已有冲突，或有subclass无法用位图表示时返回 None。
+        """
+        occupied = 0
+        for item in schedule:
+            course = self.get_course_by_code_and_semester(item['course_code'], semester)
+            if not course or item['subclass'] not in course.subclasses:
+                continue
+            occupancy = course.subclasses[item['subclass']].occupancy
+            if occupancy is None or occupancy & occupied:
+                return None
+            occupied |= occupancy
+        return occupied
+    
     def get_time_conflict(self, schedule, semester):
         """检查时间冲突，考虑每个subclass的所有time slots"""
+        # 占用位图互不相交时一定没有冲突，不需要逐个时间段比较
+        if self.schedule_occupancy(schedule, semester) is not None:
+            return []
+        
         time_slots = []
         
         for item in schedule:
@@ -255,37 +703,31 @@ class CourseDataProcessor:
             subclass_label = item['subclass']
             
             course = self.get_course_by_code_and_semester(course_code, semester)
-            if course and subclass_label in course['subclasses']:
-                subclass = course['subclasses'][subclass_label]
+            if course and subclass_label in course.subclasses:
+                subclass = course.subclasses[subclass_label]
                 # 遍历该subclass的所有time slots
-                for time_slot in subclass['time_slots']:
-                    for day in time_slot['days']:
+                for time_slot in subclass.time_slots:
+                    for day in time_slot.days:
                         time_slots.append({
                             'day': day,
-                            'start': time_slot['start_time'],
-                            'end': time_slot['end_time'],
+                            'start': time_slot.start_minutes,
+                            'end': time_slot.end_minutes,
                             'course': f"{course_code} ({subclass_label})"
                         })
         
-        # 检查冲突
-        conflicts = []
-        for i in range(len(time_slots)):
-            for j in range(i + 1, len(time_slots)):
-                slot1, slot2 = time_slots[i], time_slots[j]
-                if (slot1['day'] == slot2['day'] and 
-                    self._time_overlap(slot1['start'], slot1['end'], slot2['start'], slot2['end'])):
-                    conflicts.append((slot1['course'], slot2['course']))
-        
-        return conflicts
+        # 按天排序扫描检查冲突
+        pairs = find_conflicts([(slot['day'], slot['start'], slot['end']) for slot in time_slots])
+        return [(time_slots[i]['course'], time_slots[j]['course']) for i, j in pairs]
     
-    def _time_overlap(self, start1, end1, start2, end2):
-        """检查两个时间段是否重叠"""
-        try:
-            start1 = datetime.strptime(start1, '%H:%M:%S').time()
-            end1 = datetime.strptime(end1, '%H:%M:%S').time()
-            start2 = datetime.strptime(start2, '%H:%M:%S').time()
-            end2 = datetime.strptime(end2, '%H:%M:%S').time()
-            
-            return not (end1 <= start2 or end2 <= start1)
-        except:
-            return False
\ No newline at end of file
+    def generate_schedules(self, course_codes, semester, limit=20, time_budget=1.0):
+        """为给定课程枚举无时间冲突的subclass组合（课程须存在于该学期）
+
+        返回 {'schedules': [[{'course_code', 'subclass'}, ...], ...], 'complete', 'timed_out'}
+        """
+        courses = [self.get_course_by_code_and_semester(code, semester) for code in course_codes]
+        result = generate_schedules(courses, limit, time_budget)
+        result['schedules'] = [
+            [{'course_code': code, 'subclass': label} for code, label in schedule]
+            for schedule in result['schedules']
+        ]
+        return result
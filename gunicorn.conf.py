@@ -0,0 +1,27 @@
+"""
+gunicorn 配置（gunicorn 启动时会自动读取当前目录下的该文件）
+运行命令：gunicorn -w 4 -b 127.0.0.1:5000 app_production:app
+
+默认在 master 进程中加载课程数据后再 fork worker，所有 worker 通过
+copy-on-write 共用同一份课程数据，而不是各自在导入时重新加载一份。
+设置环境变量 CLASS_PLANNER_PRELOAD=0 可恢复每个 worker 各自加载。
+"""
+
+import gc
+import os
+
+preload_app = os.environ.get('CLASS_PLANNER_PRELOAD', '1') != '0'
+
+
+def pre_fork(server, worker):
+    # 将已加载的对象移入永久代：worker 中的GC不再扫描它们，
+    # 避免GC写入对象头导致共享内存页被逐页复制
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # 监视线程不能在 master 中启动（fork 后线程不会被继承），每个 worker 各自启动；
+    # 课表变化时各 worker 通过缓存文件锁排队，只有一个 worker 处理课表
+    import app_production
+    app_production.start_timetable_watcher()
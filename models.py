@@ -0,0 +1,106 @@
+"""
+课程数据模型：使用 __slots__ 的紧凑对象代替嵌套字典，
+to_dict() 输出与接口返回的 JSON 结构一致
+"""
+
+from dataclasses import dataclass, field
+
+from timeslots import DAY_COMBINATIONS, find_conflicts, occupancy_mask, slots_overlap
+
+
+@dataclass(slots=True)
+class TimeSlot:
+    """一个上课时间段；days 由 day_mask 推出，不单独存储"""
+    day_mask: int
+    start_time: str
+    end_time: str
+    start_minutes: int | None
+    end_minutes: int | None
+    venue: str
+    instructor: str
+
+    @property
+    def days(self):
+        return DAY_COMBINATIONS[self.day_mask]
+
+    def to_dict(self):
+        """接口返回的结构：预解析的 day_mask / 分钟数只在服务器端使用，不输出"""
+        return {
+            'days': list(self.days),
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'venue': self.venue,
+            'instructor': self.instructor
+        }
+
+
+@dataclass(slots=True)
+class Subclass:
+    """一个 CLASS NUMBER 对应的 subclass
+
+    occupancy 为一周占用位图（见 timeslots.occupancy_mask），
+    两个 subclass 的位图都不为 None 时，按位与不为 0 即表示时间冲突。
+    位图在第一次使用时才计算：加载缓存时不需要为每个 subclass 构造位图。
+    """
+    label: str
+    section: str
+    class_number: str
+    instructor: str
+    time_slots: tuple
+    # 首次使用时计算的 (occupancy, internal_conflict)
+    _conflict_info: tuple | None = field(default=None, init=False, repr=False, compare=False)
+
+    def _compute_conflict_info(self):
+        occupancy = occupancy_mask(self.time_slots)
+        internal_conflict = occupancy is None and bool(find_conflicts([
+            (day, slot.start_minutes, slot.end_minutes) for slot in self.time_slots for day in slot.days
+        ]))
+        self._conflict_info = (occupancy, internal_conflict)
+        return self._conflict_info
+
+    @property
+    def occupancy(self):
+        return (self._conflict_info or self._compute_conflict_info())[0]
+
+    @property
+    def internal_conflict(self):
+        """自身的时间段之间是否有重叠：get_time_conflict 同样会报告，这样的 subclass 无法加入日程表"""
+        return (self._conflict_info or self._compute_conflict_info())[1]
+
+    def conflicts_with(self, other):
+        """与另一个 subclass 是否有时间冲突；位图无法表示时逐个时间段比较"""
+        if self.occupancy is not None and other.occupancy is not None:
+            return bool(self.occupancy & other.occupancy)
+        return slots_overlap(self.time_slots, other.time_slots)
+
+    def to_dict(self):
+        return {
+            'label': self.label,
+            'section': self.section,
+            'class_number': self.class_number,
+            'instructor': self.instructor,
+            'time_slots': [slot.to_dict() for slot in self.time_slots]
+        }
+
+
+@dataclass(slots=True)
+class Course:
+    """某一学期的一门课程，subclasses 为 label -> Subclass"""
+    code: str
+    title: str
+    department: str
+    term: str
+    career: str
+    semester: str
+    subclasses: dict
+
+    def to_dict(self):
+        return {
+            'code': self.code,
+            'title': self.title,
+            'department': self.department,
+            'term': self.term,
+            'career': self.career,
+            'semester': self.semester,
+            'subclasses': {label: subclass.to_dict() for label, subclass in self.subclasses.items()}
+        }
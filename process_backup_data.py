@@ -2,9 +2,34 @@
 数据处理脚本：从backup文件处理数据，去除重复entries，生成新的Excel文件
 """
 
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-import os
+
+from course_data import CourseDataProcessor
+from timeslots import DAYS
+
+
+def deduplicate_entries(df):
+    """
+    去除每个课程每个class number中上课日期组合相同的重复entries
+    
+    只保留第一个出现的entry，结果按课程代码、CLASS NUMBER排序，
+    同一class number内保持原有顺序；缺少课程代码或class number的行被丢弃
+    """
+    valid_df = df.dropna(subset=['COURSE CODE', 'CLASS NUMBER'])
+    
+    # 上课日期组合编码为位掩码，作为去重的key
+    day_signature = valid_df[DAYS].notna().to_numpy() @ (1 << np.arange(len(DAYS)))
+    keys = ['COURSE CODE', 'CLASS NUMBER', '_DAY_SIGNATURE']
+    deduplicated = valid_df.assign(_DAY_SIGNATURE=day_signature).drop_duplicates(subset=keys)
+    
+    return (
+        deduplicated
+        .sort_values(['COURSE CODE', 'CLASS NUMBER'], kind='stable')
+        .drop(columns='_DAY_SIGNATURE')
+        .reset_index(drop=True)
+    )
+
 
 def process_backup_to_clean_data():
     """
@@ -24,38 +49,7 @@ def process_backup_to_clean_data():
     print(f"原始数据: {len(df)} 行, {df['COURSE CODE'].nunique()} 门课程")
     
     # 处理数据：去除每个课程每个class number中相同星期几的重复entries
-    processed_entries = []
-    
-    # 按课程代码分组
-    for course_code, course_group in df.groupby('COURSE CODE'):
-        if pd.isna(course_code):
-            continue
-            
-        # 按CLASS NUMBER分组
-        for class_number, class_group in course_group.groupby('CLASS NUMBER'):
-            if pd.isna(class_number):
-                continue
-                
-            # 对于每个class number，去除相同星期几组合的重复entries
-            processed_day_combinations = set()
-            
-            for _, row in class_group.iterrows():
-                # 获取上课日期
-                days = []
-                for day in ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']:
-                    if pd.notna(row[day]):
-                        days.append(day)
-                
-                # 将days列表转换为排序后的元组，用作去重的key
-                day_tuple = tuple(sorted(days))
-                
-                # 只保留第一个出现的相同星期几组合的entry
-                if day_tuple not in processed_day_combinations:
-                    processed_day_combinations.add(day_tuple)
-                    processed_entries.append(row.to_dict())
-    
-    # 创建新的DataFrame
-    processed_df = pd.DataFrame(processed_entries)
+    processed_df = deduplicate_entries(df)
     
     print(f"处理后数据: {len(processed_df)} 行, {processed_df['COURSE CODE'].nunique()} 门课程")
     print(f"去除了 {len(df) - len(processed_df)} 行重复数据")
@@ -64,11 +58,8 @@ def process_backup_to_clean_data():
     print(f"保存到: {output_file}")
     processed_df.to_excel(output_file, index=False)
     
-    # 删除旧的cache文件，让系统重新生成
-    cache_file = 'data/2025-26_class_timetable_20250806.cache'
-    if os.path.exists(cache_file):
-        os.remove(cache_file)
-        print(f"删除旧cache文件: {cache_file}")
+    # 更新缓存：缓存按内容哈希校验，不需要删除；保留旧缓存才能只重新处理变化的课程并输出变化报告
+    CourseDataProcessor(output_file)
     
     return processed_df
 
@@ -4,7 +4,9 @@
 运行命令：uv run python run.py
 """
 
-from app import app
+import os
+
+from app import app, start_timetable_watcher
 
 if __name__ == '__main__':
     print("=" * 50)
@@ -15,4 +17,7 @@ if __name__ == '__main__':
     print("  我的日程: http://localhost:5000/schedule")
     print("=" * 50)
     
+    # debug 模式下 reloader 的父进程只负责重启子进程，监视线程只在实际运行应用的子进程中启动
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_timetable_watcher()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+自动排课：给定若干课程，枚举每门课各选一个 subclass 且互不冲突的组合
+
+回溯搜索 + 前向检查：
+- 上课时间完全相同的 subclass 合并为一组，搜索只在组之间进行，输出时再展开
+- 用 subclass 的一周占用位图预先计算任意两门课的组之间是否兼容（候选组也用位掩码表示），
+  选定一组后立即收缩其他课程的候选组，某门课没有候选时立即回溯
+- 每一步先处理剩余候选最少的课程（most-constrained first）
+结果数量和搜索时间都有上限。
+"""
+
+import itertools
+import time
+
+from timeslots import DAYS
+
+
+def _subclass_intervals(subclass):
+    """subclass 的上课时间段 (星期序号, 开始分钟, 结束分钟)，时间无效的时间段不参与冲突"""
+    intervals = []
+    for slot in subclass.time_slots:
+        if slot.start_minutes is None or slot.end_minutes is None:
+            continue
+        for day in range(len(DAYS)):
+            if slot.day_mask & (1 << day):
+                intervals.append((day, slot.start_minutes, slot.end_minutes))
+    return tuple(sorted(intervals))
+
+
+def _overlaps(intervals, other_intervals):
+    """两组时间段是否有重叠，与 find_conflicts 的判断一致"""
+    return any(
+        day == other_day and start < other_end and other_start < end
+        for day, start, end in intervals
+        for other_day, other_start, other_end in other_intervals
+    )
+
+
+def _compatible(group, other_group):
+    """两组 subclass 是否没有时间冲突：优先用占用位图，无法用位图表示时逐个时间段比较"""
+    intervals, occupancy, _ = group
+    other_intervals, other_occupancy, _ = other_group
+    if occupancy is not None and other_occupancy is not None:
+        return not occupancy & other_occupancy
+    return not _overlaps(intervals, other_intervals)
+
+
+def _option_groups(course):
+    """按上课时间分组：[(时间段, 占用位图, [subclass label, ...])]
+
+    跳过自身时间段互相冲突的 subclass。
+    """
+    groups = {}
+    for label, subclass in course.subclasses.items():
+        intervals = _subclass_intervals(subclass)
+        if intervals not in groups:
+            if subclass.internal_conflict:
+                continue
+            groups[intervals] = (intervals, subclass.occupancy, [])
+        groups[intervals][2].append(label)
+    return list(groups.values())
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def generate_schedules(courses, limit=20, time_budget=1.0):
+    """枚举 courses 中每门课各选一个 subclass 的无冲突组合
+
+    返回 {'schedules': [[(课程代码, subclass label), ...], ...],
+          'complete': 是否已枚举全部组合, 'timed_out': 是否因超时停止}
+    每个组合按 courses 的顺序排列，最多返回 limit 个。
+    """
+    deadline = time.perf_counter() + time_budget
+    groups = [_option_groups(course) for course in courses]
+    count = len(courses)
+
+    # compatible[i][a][j]：课程 i 选第 a 组时，课程 j 仍可选的组（位掩码）
+    compatible = [
+        [[0] * count for _ in course_groups] for course_groups in groups
+    ]
+    for i, j in itertools.combinations(range(count), 2):
+        for a, group in enumerate(groups[i]):
+            for b, other_group in enumerate(groups[j]):
+                if _compatible(group, other_group):
+                    compatible[i][a][j] |= 1 << b
+                    compatible[j][b][i] |= 1 << a
+
+    schedules = []
+    # truncated：已有 limit 个组合时又找到了新的组合，即确实还有未返回的组合
+    state = {'timed_out': False, 'truncated': False, 'nodes': 0}
+    chosen = [None] * count
+
+    def expand():
+        """把一个组的组合展开为具体的 subclass 组合"""
+        labels = [groups[i][chosen[i]][2] for i in range(count)]
+        for combination in itertools.product(*labels):
+            if len(schedules) >= limit:
+                state['truncated'] = True
+                return
+            schedules.append([(course.code, label) for course, label in zip(courses, combination)])
+
+    def search(domains, remaining):
+        if not remaining:
+            expand()
+            return
+        state['nodes'] += 1
+        if state['nodes'] % 256 == 0 and time.perf_counter() > deadline:
+            state['timed_out'] = True
+            return
+
+        course = min(remaining, key=lambda i: domains[i].bit_count())
+        rest = [i for i in remaining if i != course]
+        for group in _bits(domains[course]):
+            narrowed = list(domains)
+            for other in rest:
+                narrowed[other] &= compatible[course][group][other]
+                if not narrowed[other]:
+                    break
+            else:
+                chosen[course] = group
+                search(narrowed, rest)
+            if state['truncated'] or state['timed_out']:
+                return
+
+    if all(groups):
+        search([(1 << len(course_groups)) - 1 for course_groups in groups], list(range(count)))
+
+    stopped_early = state['truncated'] or state['timed_out']
+    return {'schedules': schedules, 'complete': not stopped_early, 'timed_out': state['timed_out']}
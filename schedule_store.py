@@ -0,0 +1,110 @@
+"""
+服务器端日程表存储：session 中只保存一个不透明的日程表ID，
+每个学期的日程表以课程标识（'课程代码/class number'）列表的形式保存在服务器端
+
+- SQLiteScheduleStore: 默认后端，多个 worker 进程共用同一个数据库文件
+- MemoryScheduleStore: 只保存在当前进程内存中，用于测试和基准测试
+
+open_schedule_store('memory') 返回内存后端，其他值作为 SQLite 数据库文件路径。
+"""
+
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+_SCHEDULE_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{16,64}')
+_SEPARATOR = ' '
+
+
+def new_schedule_id():
+    """生成新的日程表ID（128 位随机数）"""
+    return secrets.token_urlsafe(16)
+
+
+def is_schedule_id(text):
+    """text 是否可能是 new_schedule_id 生成的ID"""
+    return isinstance(text, str) and _SCHEDULE_ID_PATTERN.fullmatch(text) is not None
+
+
+class MemoryScheduleStore:
+    """(日程表ID, 学期) -> 课程标识元组"""
+
+    def __init__(self):
+        self._schedules = {}
+        self._lock = threading.Lock()
+
+    def load(self, schedule_id, semester):
+        """返回日程表中的课程标识列表，不存在时返回空列表"""
+        with self._lock:
+            return list(self._schedules.get((schedule_id, semester), ()))
+
+    def save(self, schedule_id, semester, class_numbers):
+        """保存日程表，class_numbers 为空时删除"""
+        with self._lock:
+            if class_numbers:
+                self._schedules[(schedule_id, semester)] = tuple(class_numbers)
+            else:
+                self._schedules.pop((schedule_id, semester), None)
+
+
+class SQLiteScheduleStore:
+    """每个 (日程表ID, 学期) 一行，课程标识以空格分隔保存在一个文本列中"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # 每个线程各用一个连接；gunicorn 预加载时 fork 之前打开的连接不能在 worker 中继续使用
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS schedules ('
+                ' schedule_id TEXT NOT NULL,'
+                ' semester TEXT NOT NULL,'
+                ' class_numbers TEXT NOT NULL,'
+                ' updated_at INTEGER NOT NULL,'
+                ' PRIMARY KEY (schedule_id, semester)'
+                ') WITHOUT ROWID'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def load(self, schedule_id, semester):
+        """返回日程表中的课程标识列表，不存在时返回空列表"""
+        row = self._connection().execute(
+            'SELECT class_numbers FROM schedules WHERE schedule_id = ? AND semester = ?',
+            (schedule_id, semester)
+        ).fetchone()
+        return row[0].split(_SEPARATOR) if row else []
+
+    def save(self, schedule_id, semester, class_numbers):
+        """保存日程表，class_numbers 为空时删除"""
+        connection = self._connection()
+        if not class_numbers:
+            connection.execute(
+                'DELETE FROM schedules WHERE schedule_id = ? AND semester = ?',
+                (schedule_id, semester)
+            )
+            return
+        if any(_SEPARATOR in number or not number for number in class_numbers):
+            raise ValueError(f"无效的课程标识: {class_numbers!r}")
+        connection.execute(
+            'INSERT OR REPLACE INTO schedules (schedule_id, semester, class_numbers, updated_at) '
+            'VALUES (?, ?, ?, ?)',
+            (schedule_id, semester, _SEPARATOR.join(class_numbers), int(time.time()))
+        )
+
+
+def open_schedule_store(location):
+    """按配置打开日程表存储：'memory' 为内存后端，其他值为 SQLite 数据库文件路径"""
+    if location == 'memory':
+        return MemoryScheduleStore()
+    return SQLiteScheduleStore(location)
@@ -0,0 +1,248 @@
+"""
+课程搜索索引：对课程代码和课程名称建立 n-gram 倒排表，
+子串查询通过求倒排表交集得到候选，再逐个确认；
+按空闲时间段查找课程时使用每天按开始时间排序的上课时间区间
+"""
+
+import bisect
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from timeslots import DAYS
+
+# 建立倒排表的最大 n-gram 长度；更短的查询直接命中对应的倒排表
+NGRAM_SIZE = 3
+
+
+def _ngrams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class SearchIndex:
+    """单个学期的搜索索引
+
+    课程按学期字典的顺序编号，查询结果保持该顺序，
+    与逐个扫描 (query in code.lower() or query in title.lower()) 的结果一致。
+    """
+
+    def __init__(self, semester_courses):
+        self.codes = list(semester_courses)
+        self.doc_ids = {code: doc_id for doc_id, code in enumerate(self.codes)}
+        self.courses = list(semester_courses.values())
+        self._codes_lower = [code.lower() for code in self.codes]
+        self._titles_lower = [semester_courses[code].title.lower() for code in self.codes]
+
+        # n-gram -> 课程编号集合（代码与名称分别切分，避免跨字段匹配）
+        self._postings = defaultdict(set)
+        for doc_id, (code, title) in enumerate(zip(self._codes_lower, self._titles_lower)):
+            for size in range(1, NGRAM_SIZE + 1):
+                for gram in _ngrams(code, size) | _ngrams(title, size):
+                    self._postings[gram].add(doc_id)
+
+        # 院系名称（大写）-> 课程编号集合
+        self._departments = defaultdict(set)
+        for doc_id, code in enumerate(self.codes):
+            self._departments[semester_courses[code].department.upper()].add(doc_id)
+
+        # 按日程表筛选时使用的位图，第一次筛选时才建立（见 _occupancies）
+        self._occupancy_index = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _match_query(self, query):
+        """返回名称或代码包含 query（已小写）的课程编号集合"""
+        if len(query) <= NGRAM_SIZE:
+            return self._postings.get(query, set())
+
+        grams = sorted((self._postings.get(gram, set()) for gram in _ngrams(query, NGRAM_SIZE)), key=len)
+        candidates = set.intersection(*grams)
+        return {
+            doc_id for doc_id in candidates
+            if query in self._codes_lower[doc_id] or query in self._titles_lower[doc_id]
+        }
+
+    def _match_department(self, department):
+        """返回院系名称包含 department（已大写）的课程编号集合"""
+        matched = set()
+        for name, doc_ids in self._departments.items():
+            if department in name:
+                matched |= doc_ids
+        return matched
+
+    def _occupancies(self):
+        """返回 ([(课程编号, 占用位图)], {课程编号: [无法用位图表示的 subclass]})"""
+        if self._occupancy_index is None:
+            occupancies = []
+            inexact_subclasses = defaultdict(list)
+            for doc_id, course in enumerate(self.courses):
+                for subclass in course.subclasses.values():
+                    if subclass.occupancy is None:
+                        inexact_subclasses[doc_id].append(subclass)
+                    else:
+                        occupancies.append((doc_id, subclass.occupancy))
+            self._occupancy_index = (occupancies, inexact_subclasses)
+        return self._occupancy_index
+
+    def fitting_ids(self, occupied, is_free):
+        """返回至少有一个 subclass 与占用位图 occupied 不相交的课程编号集合
+
+        无法用位图表示的 subclass 由 is_free(subclass) 判断。
+        """
+        occupancies, inexact_subclasses = self._occupancies()
+        fitting = {doc_id for doc_id, occupancy in occupancies if not occupancy & occupied}
+        for doc_id, subclasses in inexact_subclasses.items():
+            if doc_id not in fitting and any(map(is_free, subclasses)):
+                fitting.add(doc_id)
+        return fitting
+
+    def search(self, query='', department=''):
+        """返回匹配课程的代码列表，保持学期字典中的顺序"""
+        return [self.codes[doc_id] for doc_id in self.search_ids(query, department)]
+
+    def search_ids(self, query='', department=''):
+        """返回匹配课程的编号序列（升序）
+
+        无筛选条件时返回 range，计数和切片都不需要生成完整列表。
+        """
+        query = query.lower() if query else ''
+        department = department.upper() if department else ''
+
+        if not query and not department:
+            return range(len(self.codes))
+
+        matched = None
+        if query:
+            matched = self._match_query(query)
+        if department and (matched is None or matched):
+            department_matched = self._match_department(department)
+            matched = department_matched if matched is None else matched & department_matched
+
+        return sorted(matched)
+
+
+class TimeWindowIndex:
+    """单个学期的上课时间区间索引：每天一组按开始时间排序的 (开始, 结束, subclass编号)
+
+    查询某个时间窗口时用二分查找定位开始时间落在窗口内的区间，
+    只需检查这些区间的结束时间，不必扫描所有课程的时间段。
+    """
+
+    def __init__(self, semester_courses):
+        self.courses = list(semester_courses.values())
+        self._subclasses = []  # subclass编号 -> (课程编号, label)
+        self._slot_counts = []  # subclass编号 -> 上课时间段数（按天展开）
+        intervals_by_day = [[] for _ in DAYS]
+        for doc_id, course in enumerate(self.courses):
+            for label, subclass in course.subclasses.items():
+                intervals = [
+                    (day, slot.start_minutes, slot.end_minutes)
+                    for slot in subclass.time_slots
+                    for day in range(len(DAYS)) if slot.day_mask & (1 << day)
+                ]
+                # 没有上课时间或时间无法解析的subclass不会出现在任何时间窗口内
+                if not intervals or any(start is None or end is None for _, start, end in intervals):
+                    continue
+                subclass_id = len(self._subclasses)
+                self._subclasses.append((doc_id, label))
+                self._slot_counts.append(len(intervals))
+                for day, start, end in intervals:
+                    intervals_by_day[day].append((start, end, subclass_id))
+
+        self._starts = []
+        self._ends = []
+        self._ids = []
+        for intervals in intervals_by_day:
+            intervals.sort()
+            self._starts.append([start for start, _, _ in intervals])
+            self._ends.append([end for _, end, _ in intervals])
+            self._ids.append([subclass_id for _, _, subclass_id in intervals])
+
+    def _contained(self, day, start, end):
+        """当天完全落在 [start, end] 内的区间对应的subclass编号"""
+        starts = self._starts[day]
+        ends = self._ends[day]
+        low = bisect.bisect_left(starts, start)
+        high = bisect.bisect_right(starts, end)
+        return [self._ids[day][i] for i in range(low, high) if ends[i] <= end]
+
+    def search(self, windows):
+        """返回 [(课程, [subclass label, ...])]：所有上课时间都落在 windows 内的subclass
+
+        windows 为 (星期序号, 开始分钟, 结束分钟) 列表，同一天重叠或相接的窗口合并后查询。
+        结果按学期字典中课程的顺序排列。
+        """
+        merged = []
+        for day, start, end in sorted(windows):
+            if merged and merged[-1][0] == day and start <= merged[-1][2]:
+                merged[-1][2] = max(merged[-1][2], end)
+            else:
+                merged.append([day, start, end])
+
+        # 合并后的窗口互不相交，每个时间段最多计数一次
+        counts = Counter()
+        for day, start, end in merged:
+            counts.update(self._contained(day, start, end))
+
+        matched = defaultdict(list)
+        for subclass_id in sorted(counts):
+            if counts[subclass_id] == self._slot_counts[subclass_id]:
+                doc_id, label = self._subclasses[subclass_id]
+                matched[doc_id].append(label)
+        return [(self.courses[doc_id], labels) for doc_id, labels in sorted(matched.items())]
+
+
+class SearchResultCache:
+    """最近搜索结果的 LRU 缓存：(query, department, semester) -> 匹配课程编号
+
+    超过 max_size 时淘汰最久未使用的条目，条目超过 ttl 秒后失效。
+    hits / misses / evictions 记录命中情况。
+    """
+
+    def __init__(self, max_size=256, ttl=600, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (过期时间, 编号序列)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """返回缓存的结果，不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, doc_ids):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, doc_ids)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
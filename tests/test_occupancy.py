@@ -0,0 +1,94 @@
+"""
+占用位图冲突判断与逐个时间段比较的等价性测试
+
+运行命令：uv run python -m unittest discover tests
+"""
+
+import os
+import random
+import unittest
+
+from course_data import CourseDataProcessor
+from models import Subclass, TimeSlot
+from timeslots import DAYS, find_conflicts
+
+TIMETABLE_FILE = 'data/2025-26_class_timetable_20250806.xlsx'
+
+
+def slot_conflicts(subclass, other):
+    """逐个时间段比较：同一天且时间区间重叠即为冲突（时间无效的时间段不参与）"""
+    return any(
+        day in other_slot.days
+        and slot.start_minutes < other_slot.end_minutes and other_slot.start_minutes < slot.end_minutes
+        for slot in subclass.time_slots if slot.start_minutes is not None and slot.end_minutes is not None
+        for day in slot.days
+        for other_slot in other.time_slots
+        if other_slot.start_minutes is not None and other_slot.end_minutes is not None
+    )
+
+
+def sweep_conflicts(processor, schedule, semester):
+    """不使用位图的 get_time_conflict：按天扫描全部时间段"""
+    time_slots = []
+    for item in schedule:
+        subclass = processor.get_course_by_code_and_semester(
+            item['course_code'], semester).subclasses[item['subclass']]
+        for slot in subclass.time_slots:
+            for day in slot.days:
+                time_slots.append((day, slot.start_minutes, slot.end_minutes,
+                                   f"{item['course_code']} ({item['subclass']})"))
+    pairs = find_conflicts([slot[:3] for slot in time_slots])
+    return [(time_slots[i][3], time_slots[j][3]) for i, j in pairs]
+
+
+def random_subclass(rng):
+    slots = []
+    for _ in range(rng.randint(0, 3)):
+        # 大多数时间按 5 分钟对齐，少数不对齐、为空或无效，覆盖无法用位图表示的情况
+        start = rng.randrange(8 * 60, 20 * 60, rng.choice([5, 5, 5, 1]))
+        end = start + rng.choice([50, 60, 90, 110, 0, 7])
+        if rng.random() < 0.05:
+            start = end = None
+        slots.append(TimeSlot(rng.randrange(1 << len(DAYS)), '', '', start, end, '', ''))
+    return Subclass('A', 'A', '1', '', tuple(slots))
+
+
+class OccupancyTest(unittest.TestCase):
+    def test_conflicts_with_matches_slot_comparison(self):
+        rng = random.Random(2025)
+        subclasses = [random_subclass(rng) for _ in range(300)]
+        self.assertTrue(any(subclass.occupancy is None for subclass in subclasses))
+        for subclass in subclasses:
+            for other in subclasses:
+                self.assertEqual(subclass.conflicts_with(other), slot_conflicts(subclass, other))
+
+    def test_internal_conflict(self):
+        overlapping = Subclass('A', 'A', '1', '', (
+            TimeSlot(0b1, '', '', 9 * 60, 10 * 60, '', ''),
+            TimeSlot(0b11, '', '', 9 * 60 + 30, 11 * 60, '', ''),
+        ))
+        self.assertIsNone(overlapping.occupancy)
+        self.assertTrue(overlapping.internal_conflict)
+        unaligned = Subclass('A', 'A', '1', '', (TimeSlot(0b1, '', '', 9 * 60 + 1, 10 * 60, '', ''),))
+        self.assertIsNone(unaligned.occupancy)
+        self.assertFalse(unaligned.internal_conflict)
+
+    @unittest.skipUnless(os.path.exists(TIMETABLE_FILE), '需要课表数据文件')
+    def test_get_time_conflict_matches_sweep(self):
+        processor = CourseDataProcessor(TIMETABLE_FILE)
+        rng = random.Random(2025)
+        for semester in processor.get_available_semesters():
+            items = [
+                {'course_code': code, 'subclass': label}
+                for code, course in processor.get_courses_by_semester(semester).items()
+                for label in course.subclasses
+            ]
+            for size in (2, 4, 8):
+                for _ in range(200):
+                    schedule = rng.sample(items, size)
+                    self.assertEqual(processor.get_time_conflict(schedule, semester),
+                                     sweep_conflicts(processor, schedule, semester))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+上课时间工具：时间解析、按天扫描的冲突检测与一周占用位图
+"""
+
+import heapq
+import re
+from collections import defaultdict
+
+DAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
+# 掩码 -> 星期列表，例如 0b101 -> ('MON', 'WED')
+DAY_COMBINATIONS = [
+    tuple(day for i, day in enumerate(DAYS) if bits & (1 << i))
+    for bits in range(1 << len(DAYS))
+]
+
+# 占用位图的时间粒度（分钟）：每天 24 * 60 / 5 = 288 位，一周 7 * 288 位
+BUCKET_MINUTES = 5
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+
+# 星期掩码 -> 各上课日在占用位图中起点位的和
+_DAY_OFFSETS = [
+    sum(1 << (i * BUCKETS_PER_DAY) for i in range(len(DAYS)) if bits & (1 << i))
+    for bits in range(1 << len(DAYS))
+]
+
+_TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?')
+
+
+def parse_time_minutes(text):
+    """将 'HH:MM:SS' 或 'HH:MM' 解析为当天的分钟数，无法解析时返回 None"""
+    match = _TIME_PATTERN.fullmatch(text) if text else None
+    if not match:
+        return None
+    hour, minute, second = (int(part or 0) for part in match.groups())
+    if hour > 23 or minute > 59 or second > 61:
+        return None
+    return hour * 60 + minute
+
+
+def find_conflicts(slots):
+    """找出所有时间重叠的时间段对
+
+    slots 为 (day, start, end) 列表，start/end 为分钟数（None 表示时间无效，
+    不参与冲突）。返回按 (i, j) 排序的下标对 i < j，
+    与逐对比较 not (end1 <= start2 or end2 <= start1) 的结果一致。
+    """
+    by_day = defaultdict(list)
+    for index, (day, start, end) in enumerate(slots):
+        if start is not None and end is not None:
+            by_day[day].append((start, end, index))
+
+    pairs = []
+    for day_slots in by_day.values():
+        day_slots.sort()
+        active = []  # (end, index) 小顶堆
+        empty = []   # start >= end 的时间段，只可能落在其他时间段内部
+        for start, end, index in day_slots:
+            if start >= end:
+                empty.append((start, end, index))
+                continue
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            for _, other in active:
+                pairs.append((min(index, other), max(index, other)))
+            heapq.heappush(active, (end, index))
+
+        for start, end, index in empty:
+            for other_start, other_end, other in day_slots:
+                if other_start < other_end and other_start < end and start < other_end:
+                    pairs.append((min(index, other), max(index, other)))
+
+    pairs.sort()
+    return pairs
+
+
+def occupancy_mask(time_slots):
+    """一组时间段（TimeSlot）的一周占用位图，Python int，每 BUCKET_MINUTES 分钟一位
+
+    时间无效或没有上课日期的时间段不占用任何位。只有所有时间段都落在
+    BUCKET_MINUTES 边界上、开始早于结束且互不重叠时，两个位图相交才与
+    find_conflicts 的判断完全一致；否则返回 None，调用方需要逐个时间段比较。
+    """
+    mask = 0
+    for slot in time_slots:
+        start, end = slot.start_minutes, slot.end_minutes
+        if not slot.day_mask or start is None or end is None:
+            continue
+        if start >= end or start % BUCKET_MINUTES or end % BUCKET_MINUTES:
+            return None
+        run = ((1 << (end - start) // BUCKET_MINUTES) - 1) << (start // BUCKET_MINUTES)
+        # 乘以每个上课日起点位的和，一次把当天的位段复制到所有上课日
+        bits = run * _DAY_OFFSETS[slot.day_mask]
+        if mask & bits:
+            return None
+        mask |= bits
+    return mask
+
+
+def slots_overlap(time_slots, other_time_slots):
+    """两组时间段（TimeSlot）之间是否有重叠，与 find_conflicts 的判断一致"""
+    return any(
+        slot.day_mask & other.day_mask
+        and slot.start_minutes < other.end_minutes and other.start_minutes < slot.end_minutes
+        for slot in time_slots
+        if slot.start_minutes is not None and slot.end_minutes is not None
+        for other in other_time_slots
+        if other.start_minutes is not None and other.end_minutes is not None
+    )
+
+
+def parse_time_window(text):
+    """将 'TUE 14:00-18:00' 解析为 (星期序号, 开始分钟, 结束分钟)
+
+    只写星期（如 'THU'）表示全天；格式无效或开始不早于结束时返回 None。
+    """
+    day, _, times = text.strip().upper().partition(' ')
+    if day not in DAYS:
+        return None
+    times = times.strip()
+    if not times:
+        return DAYS.index(day), 0, 24 * 60
+    start_text, separator, end_text = times.partition('-')
+    start = parse_time_minutes(start_text.strip())
+    end = parse_time_minutes(end_text.strip())
+    if not separator or start is None or end is None or start >= end:
+        return None
+    return DAYS.index(day), start, end
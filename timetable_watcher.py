@@ -0,0 +1,84 @@
+"""
+课表文件监视：后台线程发现 data/ 下新的或被修改的课表 xlsx 后，
+调用回调在后台构建新的数据处理器，不阻塞请求
+"""
+
+import os
+import re
+import threading
+from pathlib import Path
+
+# 课表文件名末尾的日期，如 2025-26_class_timetable_20250806.xlsx
+_DATED_STEM = re.compile(r'_(\d{8})$')
+
+
+def find_latest_timetable(data_dir):
+    """返回 data_dir 下文件名日期（*_YYYYMMDD.xlsx）最新的课表，没有时返回 None
+
+    按文件名中的日期而不是修改时间选择：git pull / rsync / touch 只改变修改时间，
+    不会让旧课表重新被选中。文件名不以日期结尾的 xlsx（如 *_backup.xlsx）被忽略。
+    """
+    candidates = []
+    for path in Path(data_dir).glob('*.xlsx'):
+        match = _DATED_STEM.search(path.stem)
+        if match and not path.name.startswith('~$'):
+            candidates.append((match.group(1), path.name, path))
+    if not candidates:
+        return None
+    return str(max(candidates)[2])
+
+
+def _file_signature(path):
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+class TimetableWatcher(threading.Thread):
+    """定期检查课表文件，文件变化且稳定后调用 on_change(path)
+
+    指定 timetable_path 时只监视该文件，否则监视 find_latest_timetable 选出的文件；
+    修改时间和大小只用于判断该文件是否变化。
+    连续两次检查得到相同的 (路径, 修改时间, 大小) 才认为文件已写完，
+    避免读到复制到一半的文件。on_change 抛出异常时保留旧数据，
+    等文件再次变化后重试。
+    """
+
+    def __init__(self, data_dir, current_path, on_change, interval=30, timetable_path=None):
+        super().__init__(name='timetable-watcher', daemon=True)
+        self.data_dir = data_dir
+        self.timetable_path = timetable_path
+        self.on_change = on_change
+        self.interval = interval
+        self._loaded = _file_signature(current_path)
+        self._pending = None
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def check(self):
+        """检查一次，文件已变化且稳定时调用 on_change"""
+        try:
+            signature = _file_signature(self.timetable_path or find_latest_timetable(self.data_dir))
+        except OSError:
+            # 文件在检查过程中被移动或删除，下次再看
+            return
+        if signature is None or signature == self._loaded:
+            self._pending = None
+            return
+        if signature != self._pending:
+            self._pending = signature
+            return
+
+        self._loaded = signature
+        self._pending = None
+        try:
+            self.on_change(signature[0])
+        except Exception as e:
+            print(f"课表重新加载失败: {e}, 继续使用旧数据")
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
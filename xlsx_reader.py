@@ -0,0 +1,197 @@
+"""
+xlsx 快速读取：直接流式解析第一个工作表的 XML，只保留需要的列，
+不为每个单元格创建 openpyxl 的 Cell 对象
+
+单元格取值规则与 pd.read_excel(engine='openpyxl') 一致（共享字符串、内联字符串、
+数字、布尔、错误值、日期格式），行列表交给 pandas 的 TextParser 推断类型和缺失值，
+因此所选列的结果与 pd.read_excel 相同。
+"""
+
+import functools
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+
+import numpy as np
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+from pandas.io.parsers import TextParser
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_DOC_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+_ROW = f'{_MAIN_NS}row'
+_CELL = f'{_MAIN_NS}c'
+_VALUE = f'{_MAIN_NS}v'
+_INLINE = f'{_MAIN_NS}is'
+_TEXT = f'{_MAIN_NS}t'
+_RUN = f'{_MAIN_NS}r'
+
+_DIGITS = '0123456789'
+
+
+@functools.lru_cache(maxsize=None)
+def _column_number(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _column_index(reference):
+    """单元格引用 (如 'AB12') 转换为从 0 开始的列号"""
+    return _column_number(reference.rstrip(_DIGITS))
+
+
+def _rich_text(element):
+    """<si> / <is> 中的文本：纯文本 <t> 或各个 <r> 中 <t> 的拼接（忽略注音）"""
+    text = element.find(_TEXT)
+    if text is not None:
+        return text.text or ''
+    return ''.join(run.findtext(_TEXT, '') for run in element.iter(_RUN))
+
+
+def _first_sheet_path(archive):
+    """工作簿中第一个工作表在压缩包内的路径"""
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    sheet = workbook.find(f'{_MAIN_NS}sheets/{_MAIN_NS}sheet')
+    relation_id = sheet.get(f'{_DOC_REL_NS}id')
+    relations = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for relation in relations.iter(f'{_REL_NS}Relationship'):
+        if relation.get('Id') == relation_id:
+            target = relation.get('Target')
+            if target.startswith('/'):
+                return target.lstrip('/')
+            return posixpath.normpath(posixpath.join('xl', target))
+    raise ValueError(f"找不到工作表: {relation_id}")
+
+
+def _uses_1904_dates(archive):
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    properties = workbook.find(f'{_MAIN_NS}workbookPr')
+    return properties is not None and properties.get('date1904') in ('1', 'true')
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    root = ElementTree.fromstring(archive.read('xl/sharedStrings.xml'))
+    return [_rich_text(item) for item in root.iter(f'{_MAIN_NS}si')]
+
+
+def _date_styles(archive):
+    """样式编号 -> 是否为时长格式，只包含日期/时间格式的样式"""
+    if 'xl/styles.xml' not in archive.namelist():
+        return {}
+    root = ElementTree.fromstring(archive.read('xl/styles.xml'))
+    formats = dict(BUILTIN_FORMATS)
+    for number_format in root.iter(f'{_MAIN_NS}numFmt'):
+        formats[int(number_format.get('numFmtId'))] = number_format.get('formatCode')
+
+    styles = {}
+    cell_formats = root.find(f'{_MAIN_NS}cellXfs')
+    for style_id, cell_format in enumerate(cell_formats if cell_formats is not None else ()):
+        format_code = formats.get(int(cell_format.get('numFmtId', 0)))
+        if format_code and is_date_format(format_code):
+            styles[str(style_id)] = is_timedelta_format(format_code)
+    return styles
+
+
+def _number(text):
+    """与 openpyxl 读取数字后再经 pandas 转换的结果一致：整数值返回 int"""
+    if '.' in text or 'E' in text or 'e' in text:
+        value = float(text)
+        return int(value) if value.is_integer() else value
+    return int(text)
+
+
+def read_xlsx(path, columns=None):
+    """读取 xlsx 的第一个工作表，返回 DataFrame
+
+    首行为表头（列名去除首尾空格），columns 指定时只解析这些列，
+    表头中不存在的列会被忽略。
+    """
+    with zipfile.ZipFile(path) as archive:
+        sheet_path = _first_sheet_path(archive)
+        strings = _shared_strings(archive)
+        date_styles = _date_styles(archive)
+        epoch = CALENDAR_MAC_1904 if _uses_1904_dates(archive) else CALENDAR_WINDOWS_1900
+
+        def cell_value(cell):
+            """单元格的值；空单元格返回 ''（与 pandas 的 openpyxl 读取一致）"""
+            cell_type = cell.get('t', 'n')
+            if cell_type == 'inlineStr':
+                inline = cell.find(_INLINE)
+                return '' if inline is None else _rich_text(inline)
+            value = cell.findtext(_VALUE)
+            if value is None:
+                return ''
+            if cell_type == 's':
+                return strings[int(value)]
+            if cell_type == 'n':
+                style = cell.get('s')
+                if style in date_styles:
+                    return from_excel(float(value), epoch, timedelta=date_styles[style])
+                return _number(value)
+            if cell_type == 'b':
+                return value == '1'
+            if cell_type == 'e':
+                return np.nan
+            return value
+
+        header = None
+        positions = {}  # 列号 -> 在 header 中的位置
+        rows = []
+        last_row_with_data = 0
+        expected_row = 1
+        with archive.open(sheet_path) as sheet:
+            for _, row in ElementTree.iterparse(sheet):
+                if row.tag != _ROW:
+                    continue
+
+                # 与 openpyxl 只读模式一致：缺失的行视为空行
+                row_number = int(row.get('r', expected_row))
+                if header is not None:
+                    rows.extend([''] * len(header) for _ in range(row_number - expected_row))
+                expected_row = row_number + 1
+
+                column = 0
+                if header is None:
+                    names = {}
+                    for cell in row.iter(_CELL):
+                        reference = cell.get('r')
+                        column = _column_index(reference) if reference else column
+                        name = cell_value(cell)
+                        if name != '':
+                            names[column] = str(name).strip()
+                        column += 1
+                    wanted = list(names.values()) if columns is None else columns
+                    header = [name for name in wanted if name in names.values()]
+                    positions = {
+                        column: header.index(name) for column, name in names.items() if name in header
+                    }
+                    row.clear()
+                    continue
+
+                has_data = False
+                values = [''] * len(header)
+                for cell in row.iter(_CELL):
+                    reference = cell.get('r')
+                    column = _column_index(reference) if reference else column
+                    position = positions.get(column)
+                    if position is not None:
+                        value = cell_value(cell)
+                        values[position] = value
+                        has_data = has_data or value != ''
+                    elif not has_data:
+                        has_data = cell.find(_VALUE) is not None or cell.find(_INLINE) is not None
+                    column += 1
+                rows.append(values)
+                if has_data:
+                    last_row_with_data = len(rows)
+                row.clear()
+
+    # 与 pandas 一致：去掉末尾的空行，中间的空行保留为全部缺失的行
+    data = [header or []] + rows[:last_row_with_data]
+    return TextParser(data, header=0, skip_blank_lines=False).read()